@@ -0,0 +1,282 @@
+# benchmark.py
+# Performance benchmarks for the tokenizers and the Part 1 preprocessing.
+#
+# For every dataset and corpus scale (first N texts) it measures:
+#   - training time, total and per merge (BPE and SentencePiece)
+#   - encode / decode throughput in bytes/s and tokens/s
+#   - peak Python memory of training and encoding (tracemalloc)
+#   - preprocess_part1 throughput
+# and writes the results as JSON, so runs on different commits can be compared.
+# Timings and memory come from separate runs: tracemalloc slows Python code down
+# several times over, so --no-memory makes a quick timing-only run.
+#
+# Run:      python benchmark.py [--scales 1000,5000,10000] [--merges 500] [--output results.json]
+# Compare:  python benchmark.py --compare old.json new.json
+
+import argparse
+import csv
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+import tracemalloc
+
+from part1.hw1_part1 import preprocess_part1
+from part2.space_base import SpaceTokenizer
+from part2.bpe import BPE_Tokenizer
+from part2.sentencePiece_bpe import SentencePieceBPE
+
+DATA_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "data")
+SENTIMENT_PATH = os.path.join(DATA_DIR, "sentiment140_noemoticon_10000.csv")
+WIKI_PATH = os.path.join(DATA_DIR, "simple_english_wikipedia_10000.txt")
+
+
+# =============================================================================
+# DATA
+# =============================================================================
+
+def load_sentiment140(path=SENTIMENT_PATH):
+    with open(path, "r", encoding="latin-1", newline="") as f:
+        return [row[-1] for row in csv.reader(f) if row]
+
+
+def load_wikipedia(path=WIKI_PATH):
+    with open(path, "r", encoding="utf-8", errors="ignore") as f:
+        return [line.strip("\n") for line in f if line.strip()]
+
+
+DATASETS = {"sentiment140": load_sentiment140, "wikipedia": load_wikipedia}
+
+
+# =============================================================================
+# MEASUREMENT HELPERS
+# =============================================================================
+
+def best_time(fn, repeats):
+    """Best wall time of `repeats` runs, and the result of the last one."""
+    best = float("inf")
+    result = None
+    for _ in range(repeats):
+        start = time.perf_counter()
+        result = fn()
+        best = min(best, time.perf_counter() - start)
+    return best, result
+
+
+def peak_memory(fn):
+    """Peak memory allocated by Python while fn runs, in bytes."""
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def throughput(n_bytes, n_tokens, seconds):
+    return {
+        "seconds": seconds,
+        "bytes_per_s": n_bytes / seconds if seconds else None,
+        "tokens_per_s": n_tokens / seconds if seconds else None,
+    }
+
+
+# =============================================================================
+# BENCHMARKS
+# =============================================================================
+
+def bench_trained(cls, texts, num_merges, repeats, measure_memory):
+    """Training, encoding and decoding of one BPE-style tokenizer on `texts`."""
+    corpus = "\n".join(texts)
+    n_bytes = sum(len(t.encode("utf-8")) for t in texts)
+
+    def train():
+        tokenizer = cls()
+        tokenizer.train(corpus, num_merges=num_merges, verbose=False)
+        return tokenizer
+
+    train_s, tokenizer = best_time(train, repeats)
+    merges = len(tokenizer.merges)
+    encode_s, encoded = best_time(lambda: [tokenizer.encode(t) for t in texts], repeats)
+    n_tokens = sum(len(ids) for ids in encoded)
+    decode_s, decoded = best_time(lambda: [tokenizer.decode(ids) for ids in encoded], repeats)
+
+    result = {
+        "train": {
+            "seconds": train_s,
+            "merges": merges,
+            "ms_per_merge": 1000 * train_s / merges if merges else None,
+        },
+        "encode": throughput(n_bytes, n_tokens, encode_s),
+        "decode": throughput(n_bytes, n_tokens, decode_s),
+        "tokens": n_tokens,
+        "bytes_per_token": n_bytes / n_tokens if n_tokens else None,
+        "roundtrip_ok": decoded == texts,
+    }
+    if measure_memory:
+        # A fresh tokenizer for encoding, so the peak includes filling the encode cache
+        fresh = train()
+        result["train"]["peak_memory_bytes"] = peak_memory(train)
+        result["encode"]["peak_memory_bytes"] = peak_memory(lambda: [fresh.encode(t) for t in texts])
+    return result
+
+
+def bench_space(texts, repeats, measure_memory):
+    tokenizer = SpaceTokenizer()
+    n_bytes = sum(len(t.encode("utf-8")) for t in texts)
+    encode_s, encoded = best_time(lambda: [tokenizer.encode(t) for t in texts], repeats)
+    n_tokens = sum(len(tokens) for tokens in encoded)
+    decode_s, _ = best_time(lambda: [tokenizer.decode(tokens) for tokens in encoded], repeats)
+    result = {
+        "encode": throughput(n_bytes, n_tokens, encode_s),
+        "decode": throughput(n_bytes, n_tokens, decode_s),
+        "tokens": n_tokens,
+    }
+    if measure_memory:
+        result["encode"]["peak_memory_bytes"] = peak_memory(lambda: [tokenizer.encode(t) for t in texts])
+    return result
+
+
+def bench_preprocess(texts, repeats, measure_memory):
+    n_bytes = sum(len(t.encode("utf-8")) for t in texts)
+    seconds, _ = best_time(lambda: [preprocess_part1(t) for t in texts], repeats)
+    result = {
+        "seconds": seconds,
+        "bytes_per_s": n_bytes / seconds if seconds else None,
+        "texts_per_s": len(texts) / seconds if seconds else None,
+    }
+    if measure_memory:
+        result["peak_memory_bytes"] = peak_memory(lambda: [preprocess_part1(t) for t in texts])
+    return result
+
+
+def git_commit():
+    try:
+        out = subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                             cwd=os.path.dirname(os.path.abspath(__file__)), check=True)
+        return out.stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_benchmarks(datasets, scales, num_merges, repeats=3, measure_memory=True, log=print):
+    results = {
+        "meta": {
+            "commit": git_commit(),
+            "python": platform.python_version(),
+            "platform": platform.platform(),
+            "time": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "num_merges": num_merges,
+            "repeats": repeats,
+        },
+        "runs": [],
+    }
+    for name in datasets:
+        all_texts = DATASETS[name]()
+        for scale in scales:
+            texts = all_texts[:scale]
+            run = {"dataset": name, "scale": len(texts), "bytes": sum(len(t.encode("utf-8")) for t in texts)}
+            log(f"{name} x {len(texts)} texts ({run['bytes']} bytes)")
+            run["preprocess_part1"] = bench_preprocess(texts, repeats, measure_memory)
+            run["space"] = bench_space(texts, repeats, measure_memory)
+            run["bpe"] = bench_trained(BPE_Tokenizer, texts, num_merges, repeats, measure_memory)
+            run["sentencepiece"] = bench_trained(SentencePieceBPE, texts, num_merges, repeats, measure_memory)
+            for key in ("bpe", "sentencepiece"):
+                r = run[key]
+                log(f"  {key:>13}: train {r['train']['seconds']:.3f}s "
+                    f"({r['train']['ms_per_merge'] or 0:.2f} ms/merge), "
+                    f"encode {r['encode']['bytes_per_s'] / 1e6:.2f} MB/s, "
+                    f"decode {r['decode']['bytes_per_s'] / 1e6:.2f} MB/s")
+            results["runs"].append(run)
+    return results
+
+
+# =============================================================================
+# COMPARISON
+# =============================================================================
+
+# (section, metric) pairs compared between two result files; for seconds lower is better
+COMPARED = [
+    ("preprocess_part1", "seconds"),
+    ("space", "encode.seconds"),
+    ("bpe", "train.seconds"),
+    ("bpe", "encode.seconds"),
+    ("bpe", "decode.seconds"),
+    ("sentencepiece", "train.seconds"),
+    ("sentencepiece", "encode.seconds"),
+    ("sentencepiece", "decode.seconds"),
+]
+
+
+def _lookup(run, section, metric):
+    value = run.get(section)
+    for key in metric.split("."):
+        if not isinstance(value, dict):
+            return None
+        value = value.get(key)
+    return value
+
+
+def compare(old, new):
+    """Yields (dataset, scale, section, metric, old_value, new_value, speedup) for matching runs."""
+    old_runs = {(r["dataset"], r["scale"]): r for r in old["runs"]}
+    for run in new["runs"]:
+        before = old_runs.get((run["dataset"], run["scale"]))
+        if before is None:
+            continue
+        for section, metric in COMPARED:
+            a = _lookup(before, section, metric)
+            b = _lookup(run, section, metric)
+            if a and b:
+                yield run["dataset"], run["scale"], section, metric, a, b, a / b
+
+
+def print_comparison(old_path, new_path):
+    with open(old_path) as f:
+        old = json.load(f)
+    with open(new_path) as f:
+        new = json.load(f)
+    print(f"{old['meta'].get('commit')} -> {new['meta'].get('commit')}")
+    for dataset, scale, section, metric, a, b, speedup in compare(old, new):
+        print(f"{dataset:>12} {scale:>6} {section + '.' + metric:>30}: "
+              f"{a:9.4f}s -> {b:9.4f}s  ({speedup:5.2f}x)")
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Tokenizer and preprocessing benchmarks")
+    parser.add_argument("--datasets", default=",".join(DATASETS),
+                        help="comma-separated subset of: " + ", ".join(DATASETS))
+    parser.add_argument("--scales", default="1000,5000,10000", help="comma-separated corpus sizes (texts)")
+    parser.add_argument("--merges", type=int, default=500, help="merges learned by each trained tokenizer")
+    parser.add_argument("--repeats", type=int, default=3, help="timed runs per measurement (best is kept)")
+    parser.add_argument("--no-memory", action="store_true", help="skip the tracemalloc peak memory runs")
+    parser.add_argument("--output", help="write the JSON results here instead of stdout")
+    parser.add_argument("--compare", nargs=2, metavar=("OLD", "NEW"), help="compare two result files")
+    args = parser.parse_args(argv)
+
+    if args.compare:
+        print_comparison(*args.compare)
+        return
+
+    datasets = [name for name in args.datasets.split(",") if name]
+    unknown = [name for name in datasets if name not in DATASETS]
+    if unknown:
+        parser.error(f"unknown dataset(s): {', '.join(unknown)}")
+    scales = [int(s) for s in args.scales.split(",") if s]
+
+    # Progress goes to stderr so the JSON on stdout stays machine-readable
+    results = run_benchmarks(datasets, scales, args.merges, repeats=args.repeats,
+                             measure_memory=not args.no_memory,
+                             log=lambda msg: print(msg, file=sys.stderr))
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+
+
+if __name__ == "__main__":
+    main()
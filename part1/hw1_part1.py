@@ -8,7 +8,14 @@
 # Note: These regexes are intentionally practical (tweets + wiki-ish text),
 # not perfect for every edge case on the internet.
 
+import hashlib
+import os
 import re
+from array import array
+from bisect import bisect_right
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 
 # Compiled patterns
 # Mention: allow @ followed by:
@@ -32,30 +39,258 @@ HASHTAG_RE = re.compile(
     r'(?<!\w)#([A-Za-z0-9_]+)'
 )
 
+# Fused pattern: all three rules in one alternation, so the pipeline scans the
+# text once instead of three times. It must give the same result as running
+# URL -> mention -> hashtag passes one after the other, which takes two extra rules:
+# - a mention/hashtag never swallows the start of a URL right after the sigil
+#   (in "@www.x.com" the URL pass wins and leaves "@[URL]")
+# - a hashtag glued to a mention still counts, because after the mention pass it
+#   follows "]" instead of a word character ("@a#b" -> "[MENTION][HASHTAG]")
+# Every branch starts with a plain character (h/H/w/W/@/#) and checks the
+# character before it with (?<!\w.) afterwards; that lets the regex engine jump
+# straight to candidate characters instead of trying every branch at every position.
+_URL_RUN = r'[^\s<>()\[\]{}"\']+'
+_NO_URL_AHEAD = r'(?!(?i:https?://|www\.)' + _URL_RUN[:-1] + r')'
+PREPROCESS_RE = re.compile(
+    r'h(?<!\w.)(?i:ttps?://)' + _URL_RUN +
+    r'|H(?<!\w.)(?i:ttps?://)' + _URL_RUN +
+    r'|w(?<!\w.)(?i:ww\.)' + _URL_RUN +
+    r'|W(?<!\w.)(?i:ww\.)' + _URL_RUN +
+    r'|@(?<!\w.)' + _NO_URL_AHEAD + r'[A-Za-z0-9_]+(?:#' + _NO_URL_AHEAD + r'[A-Za-z0-9_]+)?'
+    r'|#(?<!\w.)' + _NO_URL_AHEAD + r'[A-Za-z0-9_]+'
+)
+
+
+# Fast path: most texts contain none of the trigger characters, and a plain
+# substring test is much cheaper than starting the regex engine. When nothing can
+# match, the input string itself is returned (no new string is built).
+# Every URL contains "://" or "www." (any case), which always contains "w." or "W.".
+FAST_PATH_STATS = {
+    name: {"calls": 0, "fast_path": 0}
+    for name in ("replace_mentions", "replace_urls", "replace_hashtags", "preprocess_part1")
+}
+
+
+def fast_path_stats():
+    """Per-function call counts and how many calls took the no-match fast path."""
+    return {name: dict(stats) for name, stats in FAST_PATH_STATS.items()}
+
+
+def reset_fast_path_stats():
+    for stats in FAST_PATH_STATS.values():
+        stats["calls"] = 0
+        stats["fast_path"] = 0
+
+
+def _may_contain_url(text: str) -> bool:
+    return "://" in text or "w." in text or "W." in text
+
 
 # Regex Functions
 def replace_mentions(text: str) -> str:
     """Replace @handles with [MENTION]."""
+    stats = FAST_PATH_STATS["replace_mentions"]
+    stats["calls"] += 1
+    if "@" not in text:
+        stats["fast_path"] += 1
+        return text
     return MENTION_RE.sub("[MENTION]", text)
 
 
 def replace_urls(text: str) -> str:
     """Replace URLs with [URL]."""
+    stats = FAST_PATH_STATS["replace_urls"]
+    stats["calls"] += 1
+    if not _may_contain_url(text):
+        stats["fast_path"] += 1
+        return text
     return URL_RE.sub("[URL]", text)
 
 
 def replace_hashtags(text: str) -> str:
     """Replace hashtags with [HASHTAG]."""
+    stats = FAST_PATH_STATS["replace_hashtags"]
+    stats["calls"] += 1
+    if "#" not in text:
+        stats["fast_path"] += 1
+        return text
     return HASHTAG_RE.sub("[HASHTAG]", text)
 
 
+def _replace_match(match: re.Match) -> str:
+    """Picks the replacement for a PREPROCESS_RE match from its first character."""
+    token = match.group()
+    first = token[0]
+    if first == "@":
+        # Handles never contain '#', so one here means a glued hashtag
+        return "[MENTION][HASHTAG]" if "#" in token else "[MENTION]"
+    if first == "#":
+        return "[HASHTAG]"
+    return "[URL]"
+
+
 def preprocess_part1(text: str) -> str:
     """
     Convenience pipeline for Part 1.
     Recommended order: URLs first (so @ in query params doesn't confuse mention),
     then mentions, then hashtags.
+    Runs as a single scan with PREPROCESS_RE (same output as the three passes).
     """
+    stats = FAST_PATH_STATS["preprocess_part1"]
+    stats["calls"] += 1
+    if "@" not in text and "#" not in text and not _may_contain_url(text):
+        stats["fast_path"] += 1
+        return text
+    return PREPROCESS_RE.sub(_replace_match, text)
+
+
+# Span reporting
+# preprocess_part1_with_spans() returns the offset map as one flat array('i'),
+# SPAN_FIELDS integers per replaced entity:
+#   orig_start, orig_end, new_start, new_end, entity type (index into ENTITY_TYPES)
+ENTITY_TYPES = ("url", "mention", "hashtag")
+SPAN_FIELDS = 5
+_URL, _MENTION, _HASHTAG = range(3)
+_PLACEHOLDERS = ("[URL]", "[MENTION]", "[HASHTAG]")
+
+
+def preprocess_part1_with_spans(text: str):
+    """
+    Same rewrite as preprocess_part1, plus where every replacement came from.
+    Returns (new_text, spans); spans is a flat array('i') of SPAN_FIELDS ints per
+    entity, in text order, built during the same single regex scan. The original
+    entity is text[orig_start:orig_end] (e.g. the handle or URL for analytics).
+    """
+    spans = array('i')
+    if "@" not in text and "#" not in text and not _may_contain_url(text):
+        return text, spans
+
+    pieces = []
+    prev = 0     # end of the previous match in the original text
+    new_pos = 0  # current length of the rewritten text
+    for match in PREPROCESS_RE.finditer(text):
+        start, end = match.span()
+        pieces.append(text[prev:start])
+        new_pos += start - prev
+
+        token = match.group()
+        first = token[0]
+        if first == "@":
+            cut = token.find("#")
+            entities = [(_MENTION, start, end)] if cut == -1 else \
+                [(_MENTION, start, start + cut), (_HASHTAG, start + cut, end)]
+        elif first == "#":
+            entities = [(_HASHTAG, start, end)]
+        else:
+            entities = [(_URL, start, end)]
+
+        for kind, orig_start, orig_end in entities:
+            placeholder = _PLACEHOLDERS[kind]
+            pieces.append(placeholder)
+            spans.extend((orig_start, orig_end, new_pos, new_pos + len(placeholder), kind))
+            new_pos += len(placeholder)
+        prev = end
+
+    pieces.append(text[prev:])
+    return "".join(pieces), spans
+
+
+def iter_spans(spans):
+    """Yields (orig_start, orig_end, new_start, new_end, entity_type_name) per entity."""
+    for i in range(0, len(spans), SPAN_FIELDS):
+        yield (*spans[i:i + 4], ENTITY_TYPES[spans[i + 4]])
+
+
+def to_original_offset(spans, new_offset: int) -> int:
+    """
+    Maps an offset in the rewritten text back to the raw text.
+    Offsets inside a placeholder map to the start of the entity it replaced.
+    """
+    new_starts = spans[2::SPAN_FIELDS]
+    k = bisect_right(new_starts, new_offset) - 1
+    if k < 0:
+        return new_offset
+    base = k * SPAN_FIELDS
+    orig_start, orig_end, new_start, new_end = spans[base:base + 4]
+    if new_offset < new_end:
+        return orig_start
+    return orig_end + (new_offset - new_end)
+
+
+def preprocess_part1_multipass(text: str) -> str:
+    """Reference three-pass version of preprocess_part1 (kept for tests/benchmarks)."""
     text = replace_urls(text)
     text = replace_mentions(text)
     text = replace_hashtags(text)
     return text
+
+
+# Batch / streaming pipeline
+def _preprocess_chunk(texts):
+    return [preprocess_part1(t) for t in texts]
+
+
+def _cache_key(text: str) -> bytes:
+    """Compact 16-byte digest used as the memo key for a text."""
+    return hashlib.blake2b(text.encode("utf-8", "surrogatepass"), digest_size=16).digest()
+
+
+def _iter_chunks(texts, chunk_size):
+    it = iter(texts)
+    while True:
+        chunk = list(islice(it, chunk_size))
+        if not chunk:
+            return
+        yield chunk
+
+
+def preprocess_stream(texts, num_workers=1, chunk_size=1000, cache=None):
+    """
+    Lazily yields preprocess_part1(text) for every text, in input order.
+    texts: any iterable (list, generator, file); read chunk_size texts at a time.
+    num_workers: > 1 spreads chunks over a process pool (None = all cores), with
+        only a few chunks in flight so memory stays bounded.
+    cache: optional dict-like memo { digest of text: result }. Pass the same object
+        to later calls to skip texts that were already preprocessed.
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=num_workers) if num_workers > 1 else None
+    try:
+        pending = deque()
+        for chunk in _iter_chunks(texts, chunk_size):
+            if cache is None:
+                keys, todo_keys, todo = None, None, chunk
+            else:
+                keys = [_cache_key(t) for t in chunk]
+                # Only texts not memoized yet (once each) go to the workers
+                todo_map = {}
+                for t, k in zip(chunk, keys):
+                    if k not in cache and k not in todo_map:
+                        todo_map[k] = t
+                todo_keys, todo = list(todo_map), list(todo_map.values())
+            work = pool.submit(_preprocess_chunk, todo) if pool and todo else _preprocess_chunk(todo)
+            pending.append((keys, todo_keys, work))
+            while pending and (pool is None or len(pending) > 2 * num_workers):
+                yield from _finish_chunk(*pending.popleft(), cache)
+        while pending:
+            yield from _finish_chunk(*pending.popleft(), cache)
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+def _finish_chunk(keys, todo_keys, work, cache):
+    done = work if isinstance(work, list) else work.result()
+    if cache is None:
+        return done
+    computed = dict(zip(todo_keys, done))
+    for key, result in computed.items():
+        cache[key] = result
+    return [computed[k] if k in computed else cache[k] for k in keys]
+
+
+def preprocess_batch(texts, num_workers=1, chunk_size=1000, cache=None):
+    """preprocess_stream() collected into a list."""
+    return list(preprocess_stream(texts, num_workers=num_workers, chunk_size=chunk_size, cache=cache))
+
@@ -5,7 +5,10 @@
 # Should print each test description and pass/fail + final summary.
 
 from hw1_part1 import (
-    replace_mentions, replace_urls, replace_hashtags, preprocess_part1
+    replace_mentions, replace_urls, replace_hashtags, preprocess_part1,
+    preprocess_part1_multipass, preprocess_batch, preprocess_stream,
+    fast_path_stats, reset_fast_path_stats,
+    preprocess_part1_with_spans, iter_spans, to_original_offset
 )
 
 def assert_equal(name, got, expected):
@@ -127,6 +130,75 @@ def run_tests():
         "hey [MENTION] check [URL] [HASHTAG]"
     )
 
+    # -------------------- Fused single pass --------------------
+    tricky = [
+        "@a#b glued hashtag after a mention",
+        "@www.example.com is a URL, not a handle",
+        "#http://t.co/x tag in front of a URL",
+        "mail bob@example.com #ok @ok",
+        "HTTP://SHOUTING.COM and WWW.Caps.org",
+        "@a#www.x.com #a#b (#c) [@d]",
+    ]
+    for text in tricky:
+        total += 1
+        passed += assert_equal(
+            f"Fused pipeline matches three passes: {text!r}",
+            preprocess_part1(text),
+            preprocess_part1_multipass(text)
+        )
+
+    # -------------------- Fast path --------------------
+    reset_fast_path_stats()
+    plain = "nothing to replace here, just words."
+    results = (replace_mentions(plain) is plain, replace_urls(plain) is plain,
+               replace_hashtags(plain) is plain, preprocess_part1(plain) is plain,
+               preprocess_part1("hi @there"))
+    stats = fast_path_stats()
+    total += 1
+    passed += assert_equal(
+        "Fast path: untouched input is returned as-is and counted",
+        (results, stats["preprocess_part1"], stats["replace_urls"]),
+        ((True, True, True, True, "hi [MENTION]"), {"calls": 2, "fast_path": 1}, {"calls": 1, "fast_path": 1})
+    )
+
+    # -------------------- Span reporting --------------------
+    raw = "hey @Kenichan check https://t.co/xyz #fb"
+    new, spans = preprocess_part1_with_spans(raw)
+    total += 1
+    passed += assert_equal(
+        "Spans: rewritten text plus original entity spans",
+        (new, [(raw[a:b], kind) for a, b, _, _, kind in iter_spans(spans)]),
+        ("hey [MENTION] check [URL] [HASHTAG]",
+         [("@Kenichan", "mention"), ("https://t.co/xyz", "url"), ("#fb", "hashtag")])
+    )
+
+    total += 1
+    passed += assert_equal(
+        "Spans: offsets in the rewritten text map back to the raw text",
+        (raw[to_original_offset(spans, new.index("check"))], to_original_offset(spans, new.index("[URL]") + 2)),
+        ("c", raw.index("https"))
+    )
+
+    # -------------------- Batch / streaming --------------------
+    texts = ["hey @Kenichan check https://t.co/xyz #fb", "plain text", "#a @b"] * 30
+    expected = [preprocess_part1(t) for t in texts]
+    total += 1
+    passed += assert_equal(
+        "Batch: process pool keeps input order",
+        preprocess_batch(texts, num_workers=2, chunk_size=7),
+        expected
+    )
+
+    cache = {}
+    first = list(preprocess_stream(iter(texts), chunk_size=10, cache=cache))
+    second = preprocess_batch(texts, num_workers=2, chunk_size=10, cache=cache)
+    total += 1
+    passed += assert_equal(
+        "Stream: memoized results are reused across calls",
+        (first == expected, second == expected, len(cache)),
+        (True, True, 3)
+    )
+
     print("\n=== Summary ===")
     print(f"Passed {passed}/{total} tests.")
     return passed == total
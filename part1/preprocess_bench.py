@@ -0,0 +1,43 @@
+# preprocess_bench.py
+# Times the fused single-pass preprocess_part1 against the three-pass reference.
+#
+# Run: python preprocess_bench.py [path/to/sentiment140.csv] [repeats]
+
+import csv
+import os
+import sys
+import timeit
+
+from hw1_part1 import preprocess_part1, preprocess_part1_multipass
+
+DEFAULT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)),
+                            "..", "data", "sentiment140_noemoticon_10000.csv")
+
+
+def load_texts(path):
+    with open(path, "r", encoding="latin-1", newline="") as f:
+        return [row[-1] for row in csv.reader(f) if row]
+
+
+def run_bench(texts, repeats=5):
+    fused = [preprocess_part1(t) for t in texts]
+    multi = [preprocess_part1_multipass(t) for t in texts]
+    if fused != multi:
+        raise AssertionError("fused and three-pass preprocessing disagree")
+
+    n_chars = sum(len(t) for t in texts)
+    results = {}
+    for name, fn in [("three-pass", preprocess_part1_multipass), ("fused", preprocess_part1)]:
+        best = min(timeit.repeat(lambda: [fn(t) for t in texts], number=1, repeat=repeats))
+        results[name] = best
+        print(f"{name:>10}: {best * 1000:8.1f} ms  ({n_chars / best / 1e6:6.1f} M chars/s)")
+    print(f"   speedup: {results['three-pass'] / results['fused']:.2f}x")
+    return results
+
+
+if __name__ == "__main__":
+    path = sys.argv[1] if len(sys.argv) > 1 else DEFAULT_PATH
+    repeats = int(sys.argv[2]) if len(sys.argv) > 2 else 5
+    texts = load_texts(path)
+    print(f"{len(texts)} texts from {path}")
+    run_bench(texts, repeats)
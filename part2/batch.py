@@ -0,0 +1,104 @@
+import atexit
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+# -----------------------------------------------------------------------------
+# Batch encode/decode over a process pool
+# -----------------------------------------------------------------------------
+
+# Each worker process receives the tokenizer once, through the pool initializer,
+# and keeps it here for every chunk it processes.
+_worker_tokenizer = None
+
+# The most recently used pool is kept alive, so repeated batch calls on the same
+# (unchanged) tokenizer do not ship the merge tables to the workers again.
+# Tokenizers bump their `_generation` counter whenever their tables change
+# (train, resume; load() returns a new tokenizer), which retires a pool holding
+# the old tables.
+_pool = None
+_pool_key = None
+
+
+def _init_worker(tokenizer):
+    global _worker_tokenizer
+    _worker_tokenizer = tokenizer
+
+
+def _run_chunk(method, items):
+    fn = getattr(_worker_tokenizer, method)
+    return [fn(item) for item in items]
+
+
+def _tokenizer_state(tokenizer):
+    """Identifies the tokenizer and the version of its tables the workers were given."""
+    return (tokenizer, getattr(tokenizer, "_generation", 0))
+
+
+def get_pool(tokenizer, num_workers):
+    """Returns a process pool whose workers hold a copy of `tokenizer`."""
+    global _pool, _pool_key
+    key = (_tokenizer_state(tokenizer), num_workers)
+    if _pool is None or _pool_key != key:
+        shutdown_pool()
+        _pool = ProcessPoolExecutor(max_workers=num_workers,
+                                    initializer=_init_worker, initargs=(tokenizer,))
+        _pool_key = key
+    return _pool
+
+
+def shutdown_pool():
+    global _pool, _pool_key
+    if _pool is not None:
+        _pool.shutdown()
+    _pool = None
+    _pool_key = None
+
+
+atexit.register(shutdown_pool)
+
+
+def map_batch(tokenizer, method, items, num_workers=1, chunk_size=256):
+    """
+    Calls tokenizer.<method> on every item and returns the results in input order.
+    With num_workers > 1 the items are split into chunks of `chunk_size` and the
+    chunks are spread over worker processes (num_workers=None uses every core).
+    """
+    items = list(items)
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if num_workers <= 1 or len(items) <= chunk_size:
+        fn = getattr(tokenizer, method)
+        return [fn(item) for item in items]
+
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    pool = get_pool(tokenizer, num_workers)
+    results = []
+    for part in pool.map(_run_chunk, [method] * len(chunks), chunks):
+        results.extend(part)
+    return results
+
+
+def parallel_imap(fn, items, num_workers=1):
+    """
+    Lazily yields fn(item) for every item, in input order.
+    With num_workers > 1 the calls run in a process pool, keeping only a few tasks
+    in flight so a long (or lazily read) input is never materialized all at once.
+    fn must be a module-level function so it can be sent to the workers.
+    """
+    if num_workers is None:
+        num_workers = os.cpu_count() or 1
+    if num_workers <= 1:
+        for item in items:
+            yield fn(item)
+        return
+
+    with ProcessPoolExecutor(max_workers=num_workers) as pool:
+        pending = deque()
+        for item in items:
+            pending.append(pool.submit(fn, item))
+            if len(pending) >= 2 * num_workers:
+                yield pending.popleft().result()
+        while pending:
+            yield pending.popleft().result()
+
@@ -1,23 +1,108 @@
+import time
 import regex as re
-from collections import defaultdict, Counter
+from collections import defaultdict, Counter, OrderedDict
+
+try:
+    from .pair_index import make_pair_index
+    from .merge_encoder import apply_merges
+    from .tokenizer_io import save_checkpoint, load_checkpoint, check_checkpoint_every
+    from .tokenizer_base import TokenizerMixin
+    from .train_metrics import MergeStats
+    from .batch import parallel_imap
+except ImportError:
+    from pair_index import make_pair_index
+    from merge_encoder import apply_merges
+    from tokenizer_io import save_checkpoint, load_checkpoint, check_checkpoint_every
+    from tokenizer_base import TokenizerMixin
+    from train_metrics import MergeStats
+    from batch import parallel_imap
 
 # -----------------------------------------------------------------------------
 # 1. GPT-2 Pre-tokenization from text book (Figure 2.15)
 # -----------------------------------------------------------------------------
 
+# Compiled once at import: every encode() and every training chunk reuses it
+GPT2_SPLIT_RE = re.compile(
+    r"'s|'t|'re|'ve|'m|'ll|'d|"
+    r" ?\p{L}+|"
+    r" ?\p{N}+|"
+    r" ?[^\s\p{L}\p{N}]+|"
+    r"\s+(?!\S)|\s+"
+)
+
+# Texts longer than this are pre-tokenized lazily in encode()
+STREAMING_SPLIT_THRESHOLD = 1 << 16
+
 def get_gpt2_splits(text):
     """
     Splits text using the exact regex pattern from the textbook.
     This ensures BPE does not cross word boundaries and handles spacing correctly.
     """
-    pattern = re.compile(
-        r"'s|'t|'re|'ve|'m|'ll|'d|"
-        r" ?\p{L}+|"
-        r" ?\p{N}+|"
-        r" ?[^\s\p{L}\p{N}]+|"
-        r"\s+(?!\S)|\s+"
-    )
-    return re.findall(pattern, text)
+    return GPT2_SPLIT_RE.findall(text)
+
+def iter_gpt2_splits(text):
+    """
+    Same pieces as get_gpt2_splits, yielded one at a time (finditer) so a large
+    text is never turned into one big list of pieces.
+    """
+    for match in GPT2_SPLIT_RE.finditer(text):
+        yield match.group()
+
+def iter_text_chunks(text, chunk_chars=1 << 20):
+    """
+    Cuts a corpus into pieces of roughly `chunk_chars` characters that can be
+    pre-tokenized independently. text is either one string or an iterable of lines
+    (treated as "\n".join(lines)).
+
+    We only cut right after a newline that has non-space characters on both sides:
+    there the regex always emits "\n" as its own piece, so splitting the pieces of
+    every chunk gives exactly the splits of the whole corpus.
+    """
+    if isinstance(text, str):
+        start = 0
+        pos = chunk_chars
+        while pos < len(text):
+            j = text.find("\n", pos)
+            while j != -1 and (j == 0 or j + 1 >= len(text)
+                               or text[j - 1].isspace() or text[j + 1].isspace()):
+                j = text.find("\n", j + 1)
+            if j == -1:
+                break
+            yield text[start:j + 1]
+            start = j + 1
+            pos = start + chunk_chars
+        if start < len(text):
+            yield text[start:]
+        return
+
+    buf = []
+    size = 0
+    prev = None
+    for line in text:
+        if (prev is not None and size >= chunk_chars
+                and prev and not prev[-1].isspace() and line and not line[0].isspace()):
+            yield "\n".join(buf) + "\n"
+            buf = []
+            size = 0
+        buf.append(line)
+        size += len(line) + 1
+        prev = line
+    if buf:
+        yield "\n".join(buf)
+
+def _count_chunk(chunk):
+    return Counter(get_gpt2_splits(chunk))
+
+def count_words(text, num_workers=1, chunk_chars=1 << 20):
+    """
+    Pre-tokenizes a corpus and counts its words as byte tuples { (tuple_of_ids): frequency }.
+    Chunks are counted in `num_workers` processes and the partial Counters are merged
+    in corpus order, so the result (including its order) matches a single-threaded count.
+    """
+    words = Counter()
+    for partial in parallel_imap(_count_chunk, iter_text_chunks(text, chunk_chars), num_workers):
+        words.update(partial)
+    return Counter({tuple(w.encode('utf-8')): freq for w, freq in words.items()})
 
 # -----------------------------------------------------------------------------
 # 2. BPE Algorithm (Byte-Level)
@@ -61,91 +146,229 @@ def merge_vocab(pair, vocab, new_token_id):
 # 3. Training Script
 # -----------------------------------------------------------------------------
 
-class BPE_Tokenizer:
-    def __init__(self):
+class BPE_Tokenizer(TokenizerMixin):
+    def __init__(self, cache_size=10000):
         self.merges = {} # (id1, id2) -> new_id
         # Initialize base byte vocabulary (0-255)
         self.id_to_bytes = {i: bytes([i]) for i in range(256)}
         self.vocab_size = 256
 
-    def train(self, text, num_merges=50):
-        # Step 1: Pre-tokenize text into words using the textbook regex
-        words = get_gpt2_splits(text)
-        
-        # Step 2: Convert words to bytes and count frequencies
-        vocab = Counter()
-        for w in words:
-            vocab[tuple(w.encode('utf-8'))] += 1
+        # Per-word encode cache: word -> tuple of ids, least recently used evicted first
+        # (cache_size=0 disables it)
+        self.cache_size = cache_size
+        self.cache = OrderedDict()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def cache_info(self):
+        """Hit/miss counters and current size of the per-word encode cache."""
+        return {
+            "hits": self.cache_hits,
+            "misses": self.cache_misses,
+            "size": len(self.cache),
+            "max_size": self.cache_size,
+        }
+
+    def clear_cache(self):
+        self.cache.clear()
+        self.cache_hits = 0
+        self.cache_misses = 0
+
+    def _invalidate_tables(self):
+        # Cached encodings are only valid for the merges they were built with
+        super()._invalidate_tables()
+        self.clear_cache()
+
+    def encode_word(self, word):
+        """Encodes a single pre-tokenized word, going through the LRU cache."""
+        cache = self.cache
+        w_ids = cache.get(word)
+        if w_ids is not None:
+            cache.move_to_end(word)
+            self.cache_hits += 1
+            return w_ids
+
+        self.cache_misses += 1
+        # Start with raw bytes, then apply merges lowest rank first
+        # (same result as applying them greedily in order of learning)
+        w_ids = tuple(apply_merges(word.encode('utf-8'), self.merges))
+        if self.cache_size > 0:
+            cache[word] = w_ids
+            if len(cache) > self.cache_size:
+                cache.popitem(last=False)
+        return w_ids
+
+    def train(self, text, num_merges=50, num_workers=1, backend="python",
+              checkpoint_path=None, checkpoint_every=1000, verbose=True, callback=None,
+              vocab_size=None, min_frequency=None):
+        """
+        text: the training corpus, as one string or an iterable of lines.
+        num_merges: merge steps to run. When the pairs run out first, the remaining
+            steps add empty b"" tokens, so the vocabulary always grows by num_merges.
+        vocab_size: train up to this vocabulary size instead of num_merges steps.
+        min_frequency: stop as soon as the best pair occurs fewer times than this.
+            With vocab_size or min_frequency, training stops early rather than
+            padding with empty tokens.
+        num_workers: processes used to pre-tokenize and count words, and the
+            number of shards with backend="sharded".
+        backend: "python", "numpy" or "sharded" merge engine (same merges either way).
+        checkpoint_path: if set, the training state is saved there every
+            `checkpoint_every` merges (at least 1) and at the end (see resume()).
+        verbose: print progress and every merge.
+        callback: a TrainingCallback (see train_metrics) that receives the
+            timings of each training phase and per-merge MergeStats.
+        """
+        check_checkpoint_every(checkpoint_every)
+        self._invalidate_tables()
+
+        # Step 1 & 2: Pre-tokenize text into words using the textbook regex,
+        # then convert words to bytes and count frequencies
+        t0 = time.perf_counter()
+        vocab = count_words(text, num_workers=num_workers)
             
-        print(f"Start training with {len(vocab)} unique words...")
+        if verbose:
+            print(f"Start training with {len(vocab)} unique words...")
+
+        # Pair counts are kept up to date incrementally instead of calling
+        # get_stats() / merge_vocab() over the whole vocabulary every merge
+        t1 = time.perf_counter()
+        index = make_pair_index(vocab, backend=backend, num_workers=num_workers)
+        if vocab_size is not None:
+            num_merges = max(0, vocab_size - self.vocab_size)
+        try:
+            if callback is not None:
+                callback.on_start(len(vocab), t1 - t0, time.perf_counter() - t1)
+            self._run_merges(index, 0, num_merges, checkpoint_path, checkpoint_every, verbose, callback,
+                             pad=vocab_size is None and min_frequency is None,
+                             min_frequency=min_frequency or 0)
+        finally:
+            index.close()
 
-        for i in range(num_merges):
-            # Count pairs
-            pairs = get_stats(vocab)
-            if not pairs:
+    def resume(self, checkpoint_path, num_merges=None, backend="python", checkpoint_every=1000,
+               verbose=True, callback=None, num_workers=1, vocab_size=None, min_frequency=None):
+        """
+        Continues a run saved by train(..., checkpoint_path=...) until `num_merges`
+        merges have been done in total (or the vocabulary reaches `vocab_size`),
+        e.g. to extend a 1000-merge tokenizer to 5000. Learns the same merges as
+        one uninterrupted train() call would. The checkpoint keeps being updated
+        as training goes on.
+        """
+        if num_merges is None and vocab_size is None:
+            raise ValueError("resume() needs num_merges or vocab_size")
+        check_checkpoint_every(checkpoint_every)
+        state = load_checkpoint(checkpoint_path)
+        self._invalidate_tables()
+        self.merges = state["merges"]
+        self.id_to_bytes = state["id_to_bytes"]
+        self.vocab_size = state["vocab_size"]
+
+        if verbose:
+            print(f"Resuming training at merge {state['merges_done']} "
+                  f"with {len(state['words'])} unique words...")
+        t0 = time.perf_counter()
+        index = make_pair_index(state["words"], backend=backend, num_workers=num_workers)
+        if vocab_size is not None:
+            num_merges = state["merges_done"] + max(0, vocab_size - self.vocab_size)
+        # Bytes of the training corpus, for the compression ratio
+        num_bytes = sum(freq * sum(len(self.id_to_bytes[idx]) for idx in word)
+                        for word, freq in state["words"].items())
+        try:
+            if callback is not None:
+                callback.on_start(len(state["words"]), 0.0, time.perf_counter() - t0)
+            self._run_merges(index, state["merges_done"], num_merges, checkpoint_path, checkpoint_every,
+                             verbose, callback, pad=vocab_size is None and min_frequency is None,
+                             min_frequency=min_frequency or 0, num_bytes=num_bytes)
+        finally:
+            index.close()
+
+    def _run_merges(self, index, start, num_merges, checkpoint_path=None, checkpoint_every=1000,
+                    verbose=True, callback=None, pad=True, min_frequency=0, num_bytes=None):
+        """
+        Merge steps start .. num_merges-1 over the word state held by `index`.
+        pad: fill the steps left when no pair remains with b"" tokens; otherwise
+        stop there, or as soon as the best pair occurs fewer than min_frequency times.
+        num_bytes: corpus size in bytes (defaults to the index's token count, which
+        is the byte count before any merge).
+        """
+        clock = time.perf_counter
+        if num_bytes is None:
+            num_bytes = index.num_tokens
+        done = start
+        for i in range(start, num_merges):
+            # Find the most frequent pair
+            t0 = clock()
+            best_pair = index.best_pair()
+            t1 = clock()
+            count = 0 if best_pair is None else index.pairs.get(best_pair, 0)
+            if not pad and (best_pair is None or count < min_frequency):
+                if verbose:
+                    reason = "no pairs left" if best_pair is None else \
+                        f"best pair occurs {count} < {min_frequency} times"
+                    print(f"Stopping after {i} merges: {reason}")
+                break
+            if best_pair is None:
                 self.id_to_bytes[self.vocab_size] = b""  # dummy entry for empty token
                 self.vocab_size += 1 # increase vocab size to account for the new token
-                continue
+            else:
+                # Create new token
+                new_id = self.vocab_size
+                self.merges[best_pair] = new_id
 
-            # Find the most frequent pair
-            best_pair = max(pairs, key=pairs.get)
-            
-            # Create new token
-            new_id = self.vocab_size
-            self.merges[best_pair] = new_id
-            
-            # Update byte mapping for the new token (for visualization/decoding)
-            self.id_to_bytes[new_id] = self.id_to_bytes[best_pair[0]] + self.id_to_bytes[best_pair[1]]
-            
-            # Apply merge to the vocabulary
-            vocab = merge_vocab(best_pair, vocab, new_id)
-            self.vocab_size += 1
-            
-            print(f"Merge {i+1}: {best_pair} -> {new_id} ({self.id_to_bytes[new_id]})")
+                # Update byte mapping for the new token (for visualization/decoding)
+                self.id_to_bytes[new_id] = self.id_to_bytes[best_pair[0]] + self.id_to_bytes[best_pair[1]]
+
+                # Apply merge to the words that contain the pair
+                t2 = clock()
+                touched = index.merge(best_pair, new_id)
+                t3 = clock()
+                self.vocab_size += 1
+
+                if verbose:
+                    print(f"Merge {i+1}: {best_pair} -> {new_id} ({self.id_to_bytes[new_id]})")
+                if callback is not None:
+                    tokens = index.num_tokens
+                    callback.on_merge(MergeStats(i + 1, best_pair, new_id, count, touched, t1 - t0, t3 - t2,
+                                                 tokens, num_bytes / tokens))
+
+            done = i + 1
+            if checkpoint_path is not None and done % checkpoint_every == 0:
+                self._save_checkpoint(checkpoint_path, index, done)
+
+        if checkpoint_path is not None:
+            self._save_checkpoint(checkpoint_path, index, done)
+        if callback is not None:
+            callback.on_end()
+
+    def _save_checkpoint(self, path, index, merges_done):
+        save_checkpoint(path, {
+            "merges": self.merges,
+            "id_to_bytes": self.id_to_bytes,
+            "vocab_size": self.vocab_size,
+            "merges_done": merges_done,
+            "words": index.sequences(),
+        })
 
     def encode(self, text):
         """Encodes new text using learned merges."""
-        words = get_gpt2_splits(text)
+        if len(text) > STREAMING_SPLIT_THRESHOLD:
+            words = iter_gpt2_splits(text)
+        else:
+            words = get_gpt2_splits(text)
         ids = []
         
         for word in words:
-            # Start with raw bytes
-            w_ids = list(word.encode('utf-8'))
-            
-            # Apply merges greedily in order of learning
-            while len(w_ids) >= 2:
-                # Iterate through all learned merges
-                # If the pair exists in the word, merge it.
-                changed = False
-                for pair, new_id in self.merges.items():
-                    new_w_ids = []
-                    i = 0
-                    while i < len(w_ids):
-                        if i < len(w_ids) - 1 and w_ids[i] == pair[0] and w_ids[i+1] == pair[1]:
-                            new_w_ids.append(new_id)
-                            i += 2
-                            changed = True
-                        else:
-                            new_w_ids.append(w_ids[i])
-                            i += 1
-                    w_ids = new_w_ids
-                    if changed:
-                        break # Restart scan after a merge
-                
-                if not changed:
-                    break
-            
-            ids.extend(w_ids)
+            ids.extend(self.encode_word(word))
             
         return ids
-    
-    def decode(self, ids):
+
+    def encode_greedy(self, text):
         """
-        Converts a list of token IDs back into a string.
+        Approximate encode(): each GPT-2 piece is cut into the longest vocabulary
+        tokens left to right (TokenTrie), ignoring merge order. Faster on unseen
+        words, but the ids can differ from encode(); see trie_encoder.greedy_divergence.
         """
-        # 1. Concatenate the bytes for every token ID
-        # self.id_to_bytes is the dictionary we built during training 
-        byte_sequence = b"".join([self.id_to_bytes[idx] for idx in ids])
-        
-        # 2. Decode the byte sequence into a UTF-8 string
-        return byte_sequence.decode('utf-8', errors='replace')
\ No newline at end of file
+        trie = self.token_trie()
+        ids = []
+        for word in get_gpt2_splits(text):
+            ids.extend(trie.encode(word.encode('utf-8')))
+        return ids
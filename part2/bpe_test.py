@@ -1,4 +1,9 @@
-from bpe import BPE_Tokenizer, get_gpt2_splits
+from collections import Counter
+from bpe import BPE_Tokenizer, get_gpt2_splits, iter_gpt2_splits, get_stats, merge_vocab, count_words
+import bpe
+from pair_index import PairIndex
+from merge_queue import MergeQueue
+from merge_encoder import apply_merges
 
 class BPE_Test_Suite:
     def __init__(self):
@@ -53,6 +58,21 @@ def run_suite():
         return "'re" in splits
     tester.run_check("Handling English contractions (e.g. 're)", test_contraction_split)
 
+    def test_streaming_splits():
+        # Lazy finditer splitting yields the same pieces as findall, also inside encode()
+        text = "We're   going to   the store, aren't we?\n\n 123 tests " * 20
+        tokenizer = BPE_Tokenizer()
+        tokenizer.train(text, num_merges=10)
+        eager = tokenizer.encode(text)
+        old_threshold = bpe.STREAMING_SPLIT_THRESHOLD
+        bpe.STREAMING_SPLIT_THRESHOLD = 0
+        try:
+            lazy = tokenizer.encode(text)
+        finally:
+            bpe.STREAMING_SPLIT_THRESHOLD = old_threshold
+        return list(iter_gpt2_splits(text)) == get_gpt2_splits(text) and lazy == eager
+    tester.run_check("Streaming pre-tokenizer matches findall", test_streaming_splits)
+
 
     print("\n--- Group 2: Basic BPE Training & Encoding ---")
     
@@ -74,6 +94,54 @@ def run_suite():
         return tokenizer.vocab_size == initial_size + 5
     tester.run_check("Vocabulary size growth correctness", test_vocab_growth)
 
+    def test_incremental_pair_counts():
+        # The incremental index must agree with a full recount after every merge
+        vocab = Counter(tuple(w.encode('utf-8')) for w in get_gpt2_splits("the cat sat on the mat, aaaa bbb"))
+        index = PairIndex(vocab)
+        new_id = 256
+        for _ in range(8):
+            best_pair = index.best_pair()
+            stats = get_stats(vocab)
+            if best_pair != max(stats, key=stats.get):
+                return False
+            index.merge(best_pair, new_id)
+            vocab = merge_vocab(best_pair, vocab, new_id)
+            if dict(index.pairs) != {p: c for p, c in get_stats(vocab).items() if c}:
+                return False
+            new_id += 1
+        return index.sequences() == vocab
+    tester.run_check("Incremental pair counts match a full recount", test_incremental_pair_counts)
+
+    def test_low_count_ties():
+        # Run until the pairs run out, where most pairs tie on a count of 1 or 2:
+        # the keyed queue must still pick the pair get_stats() would see first
+        vocab = Counter(tuple(w.encode('utf-8')) for w in get_gpt2_splits(
+            "zebra quartz jinx, a wry vow; the box of myth gulps fjord kiwis. abab baba zz"))
+        index = PairIndex(vocab)
+        new_id = 256
+        while True:
+            stats = get_stats(vocab)
+            best_pair = index.best_pair()
+            if not stats:
+                return best_pair is None
+            if best_pair != max(stats, key=stats.get):
+                return False
+            index.merge(best_pair, new_id)
+            vocab = merge_vocab(best_pair, vocab, new_id)
+            new_id += 1
+    tester.run_check("Low-count ties follow the first occurrence", test_low_count_ties)
+
+    def test_merge_queue_lazy_updates():
+        # Stale heap entries must be skipped, and ties resolved by the tie key
+        counts = {(1, 2): 5, (3, 4): 2, (5, 6): 2}
+        queue = MergeQueue(counts)
+        counts[(1, 2)] = 1
+        queue.push((1, 2), 1)
+        first = queue.pop_best(counts, tie_key=lambda p: -p[0])
+        second = queue.pop_best(counts)
+        return first == (5, 6) and second == (3, 4)
+    tester.run_check("Merge queue skips stale entries and breaks ties deterministically", test_merge_queue_lazy_updates)
+
 
     print("\n--- Group 3: Byte-Level & Unicode Support (Edge Cases) ---")
 
@@ -115,6 +183,335 @@ def run_suite():
         return decoded == "apricot"
     tester.run_check("Generalization to unseen words", test_unknown_words)
 
+    def test_rank_encoder_matches_greedy():
+        # The heap-based encoder must match "merge the earliest learned pair everywhere, repeat"
+        tokenizer = BPE_Tokenizer()
+        tokenizer.train("aaaa aaaaaaa banana bandana abab", num_merges=12)
+        for word in ["aaaaaaaaa", " banana", " bandanas", "ababab", "b"]:
+            ids = list(word.encode('utf-8'))
+            while True:
+                present = [tokenizer.merges[p] for p in zip(ids, ids[1:]) if p in tokenizer.merges]
+                if not present:
+                    break
+                new_id = min(present)
+                pair = next(p for p, i in tokenizer.merges.items() if i == new_id)
+                ids = list(merge_vocab(pair, {tuple(ids): 1}, new_id))[0]
+            if apply_merges(word.encode('utf-8'), tokenizer.merges) != list(ids):
+                return False
+        return True
+    tester.run_check("Rank-based encoder matches greedy merge order", test_rank_encoder_matches_greedy)
+
+    def test_word_cache():
+        # Repeated words are served from the cache, and eviction keeps it bounded
+        tokenizer = BPE_Tokenizer(cache_size=2)
+        tokenizer.train("the cat and the hat", num_merges=5)
+        first = tokenizer.encode("the the the")
+        info = tokenizer.cache_info()
+        second = tokenizer.encode("cat hat and the")
+        return (first == tokenizer.encode("the the the") and info["hits"] == 1 and info["misses"] == 2
+                and len(tokenizer.cache) == 2 and tokenizer.decode(second) == "cat hat and the")
+    tester.run_check("Per-word LRU encode cache", test_word_cache)
+
+    def test_batch_encode_parallel():
+        # Process-pool batch results must match one-by-one encoding, in input order
+        tokenizer = BPE_Tokenizer()
+        tokenizer.train("the quick brown fox jumps over the lazy dog", num_merges=10)
+        texts = [f"the {i} fox over the dog" for i in range(40)]
+        batch = tokenizer.encode_batch(texts, num_workers=2, chunk_size=8)
+        return (batch == [tokenizer.encode(t) for t in texts]
+                and tokenizer.decode_batch(batch, num_workers=2, chunk_size=8) == texts)
+    tester.run_check("Batch encode/decode over a process pool", test_batch_encode_parallel)
+
+    def test_parallel_word_counts():
+        # Chunked, multi-process counting must give the same words, counts and order
+        lines = ["Hello world", "trailing space ", "", "  indented", "We're here!", "Hello again"] * 20
+        text = "\n".join(lines)
+        expected = Counter(tuple(w.encode('utf-8')) for w in get_gpt2_splits(text))
+        counted = count_words(lines, num_workers=2, chunk_chars=40)
+        return list(counted.items()) == list(expected.items()) and count_words(text, chunk_chars=40) == expected
+    tester.run_check("Parallel map-reduce word counting", test_parallel_word_counts)
+
+    def test_streaming_training():
+        # Training from a lazily read file must learn the same merges as the joined string
+        import os, tempfile
+        lines = ["low lower lowest", "new newer newest", "", "wide wider widest"]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corpus.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            streamed = BPE_Tokenizer()
+            streamed.train_from_files(path, num_merges=8)
+        from_lines = BPE_Tokenizer()
+        from_lines.train_from_iterator((line + "\n" for line in lines), num_merges=8)
+        reference = BPE_Tokenizer()
+        reference.train("\n".join(lines), num_merges=8)
+        return streamed.merges == reference.merges and from_lines.merges == reference.merges
+    tester.run_check("Streaming training from files and iterators", test_streaming_training)
+
+    def test_save_load_roundtrip():
+        # A saved tokenizer must reload with the same tables and encodings; once
+        # loaded it no longer depends on the file (pickling keeps its own tables)
+        import os, pickle, tempfile
+        tokenizer = BPE_Tokenizer()
+        tokenizer.train("aaa", num_merges=3)  # includes a dummy b"" token
+        text = "aaaa aa héllo"
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "bpe.tok")
+            tokenizer.save(path)
+            loaded = BPE_Tokenizer.load(path)
+            other = BPE_Tokenizer()
+            other.train("héllo héllo", num_merges=3)
+            other.save(path)
+            clone = pickle.loads(pickle.dumps(loaded))
+            os.remove(path)
+            return (list(loaded.merges.items()) == list(tokenizer.merges.items())
+                    and loaded.id_to_bytes == tokenizer.id_to_bytes
+                    and loaded.vocab_size == tokenizer.vocab_size
+                    and loaded.encode(text) == tokenizer.encode(text)
+                    and clone.merges == loaded.merges and clone.encode(text) == loaded.encode(text)
+                    and pickle.loads(pickle.dumps(loaded)).id_to_bytes == loaded.id_to_bytes)
+    tester.run_check("Binary save/load round trip", test_save_load_roundtrip)
+
+    def test_checkpoint_resume():
+        # Stopping at a checkpoint and resuming must learn the same merges as one run
+        import os, tempfile
+        text = "low lower lowest newer newest widest " * 3 + "aaaa aa"
+        reference = BPE_Tokenizer()
+        reference.train(text, num_merges=30)  # runs out of pairs: pads dummy tokens
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "train.ckpt")
+            first = BPE_Tokenizer()
+            first.train(text, num_merges=10, checkpoint_path=path, checkpoint_every=4)
+            resumed = BPE_Tokenizer()
+            resumed.resume(path, num_merges=30)
+            try:
+                BPE_Tokenizer().train("aa", 2, checkpoint_path=path, checkpoint_every=0)
+                rejected = False
+            except ValueError:
+                rejected = True
+        return (list(resumed.merges.items()) == list(reference.merges.items())
+                and resumed.id_to_bytes == reference.id_to_bytes
+                and resumed.vocab_size == reference.vocab_size and rejected)
+    tester.run_check("Checkpoint and resume training", test_checkpoint_resume)
+
+    def test_batch_after_resume():
+        # Resuming from another checkpoint of the same size changes the merges but
+        # not the vocabulary size; the warm worker pool must not keep the old ones
+        import os, tempfile
+        texts = ["aaa bbb ccc"] * 4 + ["xyz xyz xyz"] * 4
+        tokenizer = BPE_Tokenizer()
+        results = []
+        with tempfile.TemporaryDirectory() as tmp:
+            for k, corpus in enumerate(["aaa aaa bbb", "xyz xyz xy"]):
+                path = os.path.join(tmp, f"{k}.ckpt")
+                BPE_Tokenizer().train(corpus, num_merges=2, checkpoint_path=path, verbose=False)
+                tokenizer.resume(path, num_merges=4, verbose=False)
+                batch = tokenizer.encode_batch(texts, num_workers=2, chunk_size=2)
+                results.append(batch == [tokenizer.encode(t) for t in texts])
+        return all(results)
+    tester.run_check("Batch encode after resume() uses the new merges", test_batch_after_resume)
+
+    def test_table_and_stream_decode():
+        # array('i') ids and one-id-at-a-time streaming must decode like a list,
+        # even when a multi-byte character is split across tokens
+        from array import array
+        tokenizer = BPE_Tokenizer()
+        tokenizer.train("naïve café, déjà vu", num_merges=6)
+        text = "café naïve 日本"
+        ids = tokenizer.encode(text)
+        stream = tokenizer.stream_decoder()
+        pieces = [stream.decode([idx]) for idx in ids]
+        return (tokenizer.decode(array('i', ids)) == text
+                and "".join(pieces) + stream.flush() == text
+                and "" in pieces)  # incomplete characters were held back
+    tester.run_check("Byte table decode and streaming decoder", test_table_and_stream_decode)
+
+    def test_decode_invalid_ids():
+        # Ids outside the vocabulary must fail loudly; negative ids must not wrap around
+        tokenizer = BPE_Tokenizer()
+        failures = 0
+        for ids in ([104, -1], [104, 256], iter([-2])):
+            try:
+                tokenizer.decode(ids)
+            except KeyError:
+                failures += 1
+        return failures == 3
+    tester.run_check("Decode rejects ids outside the vocabulary", test_decode_invalid_ids)
+
+    def test_training_metrics():
+        # A silent run reports one MergeStats per merge with the pair counts and touched words
+        import contextlib, io
+        from train_metrics import TrainingMetrics
+        metrics = TrainingMetrics()
+        tokenizer = BPE_Tokenizer()
+        out = io.StringIO()
+        with contextlib.redirect_stdout(out):
+            tokenizer.train("low low lower lowest", num_merges=3, verbose=False, callback=metrics)
+        first = metrics.merges[0]
+        summary = metrics.summary()
+        # Words: "low", " low", " lower", " lowest"; "lo" appears once in each
+        return (out.getvalue() == "" and metrics.num_sequences == 4
+                and [m.new_id for m in metrics.merges] == [256, 257, 258]
+                and first.pair == (ord("l"), ord("o")) and first.count == 4 and first.touched == 4
+                and summary["merges"] == 3 and summary["total_s"] >= summary["merge_s"] >= 0)
+    tester.run_check("Training metrics callback and silent training", test_training_metrics)
+
+    def test_encode_with_offsets():
+        # Byte spans must slice out each token's bytes; char spans must cover whole characters
+        tokenizer = BPE_Tokenizer()
+        tokenizer.train("café café naïve naïve", num_merges=10)
+        text = "café naïve  日本\n"
+        ids, starts, ends = tokenizer.encode_with_offsets(text)
+        data = text.encode('utf-8')
+        byte_ok = (list(ids) == tokenizer.encode(text)
+                   and [data[s:e] for s, e in zip(starts, ends)] == [tokenizer.id_to_bytes[i] for i in ids])
+        _, cstarts, cends = tokenizer.encode_with_offsets(text, unit="char")
+        # "é" is split into two byte tokens unless merged: both map to the same character
+        char_ok = (cstarts[0] == 0 and cends[-1] == len(text)
+                   and all(text[s:e].encode('utf-8').find(tokenizer.id_to_bytes[i]) >= 0
+                           for i, s, e in zip(ids, cstarts, cends)))
+        return byte_ok and char_ok
+    tester.run_check("Encode with byte and character offsets", test_encode_with_offsets)
+
+    def test_encode_into_and_flat_batch():
+        # Ids written into a preallocated buffer / flat batch must match encode()
+        from array import array
+        tokenizer = BPE_Tokenizer()
+        tokenizer.train("the cat sat on the mat", num_merges=8)
+        texts = ["the cat", "", "on the mat", "sat"]
+        buf = array('i', [-1] * 12)
+        written = tokenizer.encode_into("the cat", buf, start=2)
+        try:
+            tokenizer.encode_into("the mat sat on the cat", array('i', [0] * 3))
+            too_small = False
+        except ValueError:
+            too_small = True
+        ids, offsets = tokenizer.encode_batch_flat(texts)
+        ids2, offsets2 = tokenizer.encode_batch_flat(texts, num_workers=2, chunk_size=1)
+        return (list(buf[2:2 + written]) == tokenizer.encode("the cat") and buf[:2] == array('i', [-1, -1])
+                and too_small and len(offsets) == len(texts) + 1
+                and [list(ids[offsets[k]:offsets[k + 1]]) for k in range(len(texts))]
+                    == [tokenizer.encode(t) for t in texts]
+                and ids2 == ids and offsets2 == offsets)
+    tester.run_check("Encode into preallocated buffers and flat batches", test_encode_into_and_flat_batch)
+
+    def test_greedy_trie_encoder():
+        # Longest match ignores merge order: with "bc" learned before "ab",
+        # "abc" merges to a + bc but greedily splits as ab + c
+        from trie_encoder import TokenTrie, greedy_divergence
+        tokens = [bytes([i]) for i in range(256)] + [b"bc", b"ab", b""]
+        trie_ok = TokenTrie(tokens).encode(b"abcab") == [257, ord("c"), 257]
+        tokenizer = BPE_Tokenizer()
+        tokenizer.train("ab ab ab abc", num_merges=12)  # includes b"" padding tokens
+        text = "abc abab, cab"
+        report = greedy_divergence(tokenizer, [text, "ab", ""])
+        return (trie_ok and tokenizer.decode(tokenizer.encode_greedy(text)) == text
+                and report["texts"] == 3 and 0 <= report["diverged_texts"] <= 1
+                and report["matching_tokens"] <= report["exact_tokens"])
+    tester.run_check("Greedy longest-match trie encoder", test_greedy_trie_encoder)
+
+    def test_sharded_backend():
+        # Shards in worker processes must learn the same merges, ties and padding included
+        text = "cd cd ab ab ef\nab cd gh gh\nthe cat sat on the mat\nababab"
+        reference = BPE_Tokenizer()
+        reference.train(text, num_merges=40, verbose=False)
+        sharded = BPE_Tokenizer()
+        sharded.train(text, num_merges=40, backend="sharded", num_workers=3, verbose=False)
+        return (list(sharded.merges.items()) == list(reference.merges.items())
+                and sharded.vocab_size == reference.vocab_size)
+    tester.run_check("Sharded backend learns the same merges", test_sharded_backend)
+
+    def test_vocab_size_and_min_frequency():
+        # Target modes stop early instead of padding with b"" tokens
+        from train_metrics import TrainingMetrics
+        text = "ababababab"
+        padded = BPE_Tokenizer()
+        padded.train(text, num_merges=6, verbose=False)
+        targeted = BPE_Tokenizer()
+        targeted.train(text, verbose=False, vocab_size=262)
+        metrics = TrainingMetrics()
+        thresholded = BPE_Tokenizer()
+        thresholded.train("low low low lower newest", num_merges=50, verbose=False,
+                          min_frequency=3, callback=metrics)
+        return (padded.vocab_size == 262 and b"" in padded.id_to_bytes.values()
+                and targeted.vocab_size < 262 and b"" not in targeted.id_to_bytes.values()
+                and list(targeted.merges.items()) == list(padded.merges.items())
+                and all(m.count >= 3 for m in metrics.merges) and len(metrics.merges) > 0)
+    tester.run_check("Vocabulary size target and minimum pair frequency", test_vocab_size_and_min_frequency)
+
+
+    try:
+        import numpy  # noqa: F401  (optional dependency of the numpy backend)
+        HAS_NUMPY = True
+    except ImportError:
+        print("[!] NumPy not installed: skipping NumPy backend test")
+        HAS_NUMPY = False
+
+    def test_numpy_backend():
+        # The vectorized backend must learn the same merges as the pure-Python one
+        text = "aaaa aaa the cat sat on the mat, the bat sat! banana bandana"
+        reference = BPE_Tokenizer()
+        reference.train(text, num_merges=15)
+        vectorized = BPE_Tokenizer()
+        vectorized.train(text, num_merges=15, backend="numpy")
+        return list(vectorized.merges.items()) == list(reference.merges.items())
+    if HAS_NUMPY:
+        tester.run_check("NumPy backend learns the same merges", test_numpy_backend)
+
+    def test_numpy_decode():
+        # Decoding a NumPy id array goes through the vectorized gather
+        tokenizer = BPE_Tokenizer()
+        tokenizer.train("the cat sat on the mat", num_merges=8)
+        text = "the mat sat on the cat ✓"
+        ids = tokenizer.encode(text)
+        try:
+            tokenizer.decode(numpy.array([104, -1], dtype=numpy.int32))
+            rejected = False
+        except KeyError:
+            rejected = True
+        return (tokenizer.decode(numpy.array(ids, dtype=numpy.int32)) == text
+                and tokenizer.decode(numpy.array([], dtype=numpy.int32)) == ""
+                and rejected)
+    if HAS_NUMPY:
+        tester.run_check("Decode from a NumPy id array", test_numpy_decode)
+
+    def test_numpy_outputs():
+        # NumPy int32 buffers work as encode_into targets; flat batches come back as views
+        tokenizer = BPE_Tokenizer()
+        tokenizer.train("the cat sat on the mat", num_merges=8)
+        buf = numpy.zeros(16, dtype=numpy.int32)
+        n = tokenizer.encode_into("the mat", buf)
+        ids, offsets = tokenizer.encode_batch_flat(["the cat", "the mat"], as_numpy=True)
+        try:
+            tokenizer.encode_into("the mat", numpy.zeros(16, dtype=numpy.int64))
+            wrong_dtype = False
+        except TypeError:
+            wrong_dtype = True
+        return (buf[:n].tolist() == tokenizer.encode("the mat") and ids.dtype == numpy.int32
+                and ids[offsets[1]:offsets[2]].tolist() == tokenizer.encode("the mat") and wrong_dtype)
+    if HAS_NUMPY:
+        tester.run_check("Encode into NumPy buffers", test_numpy_outputs)
+
+    def test_compression_per_merge():
+        # Token totals after each merge must match the merged words, for every backend
+        from train_metrics import TrainingMetrics
+        text = "aaaa aaa the cat sat on the mat, banana bandana"
+        totals = []
+        for backend in ["python", "sharded"] + (["numpy"] if HAS_NUMPY else []):
+            metrics = TrainingMetrics()
+            BPE_Tokenizer().train(text, num_merges=12, backend=backend, num_workers=2,
+                                  verbose=False, callback=metrics)
+            totals.append([(m.tokens, m.compression) for m in metrics.merges])
+        words = Counter(tuple(w.encode('utf-8')) for w in get_gpt2_splits(text))
+        reference = BPE_Tokenizer()
+        reference.train(text, num_merges=12, verbose=False)
+        for pair, new_id in reference.merges.items():
+            words = merge_vocab(pair, words, new_id)
+        final = sum(len(w) * f for w, f in words.items())
+        return (all(t == totals[0] for t in totals) and totals[0][-1][0] == final
+                and totals[0][-1][1] == len(text.encode('utf-8')) / final)
+    tester.run_check("Compression reported per merge", test_compression_per_merge)
+
     tester.summary()
 
 if __name__ == "__main__":
@@ -0,0 +1,38 @@
+# -----------------------------------------------------------------------------
+# Lazy corpus readers for training
+# -----------------------------------------------------------------------------
+
+def split_lines(text):
+    """Yields the same lines as text.split('\n'), one at a time, without building the list."""
+    start = 0
+    while True:
+        end = text.find("\n", start)
+        if end == -1:
+            yield text[start:]
+            return
+        yield text[start:end]
+        start = end + 1
+
+
+def iter_lines(lines, encoding="utf-8", errors="strict"):
+    """
+    Normalizes an iterable of lines (list, generator, open file, mmap.readline loop, ...):
+    strips the trailing newline and decodes bytes lines.
+    """
+    for line in lines:
+        if isinstance(line, (bytes, bytearray, memoryview)):
+            line = bytes(line).decode(encoding, errors)
+        if line.endswith("\n"):
+            line = line[:-1]
+            if line.endswith("\r"):
+                line = line[:-1]
+        yield line
+
+
+def iter_file_lines(paths, encoding="utf-8", errors="strict"):
+    """Streams the lines of one or more text files, in order, one line at a time."""
+    if isinstance(paths, (str, bytes)) or hasattr(paths, "__fspath__"):
+        paths = [paths]
+    for path in paths:
+        with open(path, "r", encoding=encoding, errors=errors) as f:
+            yield from iter_lines(f)
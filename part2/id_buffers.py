@@ -0,0 +1,62 @@
+from array import array
+
+try:
+    from .batch import map_batch
+except ImportError:
+    from batch import map_batch
+
+# -----------------------------------------------------------------------------
+# Token ids in flat int32 buffers
+# -----------------------------------------------------------------------------
+#
+# encode() still builds each text's ids as a Python list. That list is converted
+# to C ints in a single call (array('i', ...) / array.fromlist), which measures
+# faster than extending an array word by word. The ids are then handed out as
+# flat buffers: copied into a caller's preallocated array('i') / NumPy int32
+# array (encode_into), or, for a batch, one ids buffer plus an offsets array
+# (ragged layout):
+#   the ids of text k are ids[offsets[k]:offsets[k + 1]]
+
+
+def int32_view(buf):
+    """Writable 1-D int32 memoryview of `buf` (array('i'), NumPy int32 array, ...)."""
+    view = memoryview(buf)
+    if view.ndim != 1 or view.format != "i" or view.readonly:
+        raise TypeError("expected a writable 1-D array('i') or int32 NumPy array")
+    return view
+
+
+def write_ids(ids, buf, start=0):
+    """Copies the array('i') `ids` into buf[start:]. Returns the number of ids written."""
+    view = int32_view(buf)
+    end = start + len(ids)
+    if start < 0 or end > len(view):
+        raise ValueError(f"buffer too small: {len(ids)} ids from position {start} "
+                         f"need {end} slots, buffer has {len(view)}")
+    view[start:end] = ids
+    return len(ids)
+
+
+def flat_batch(tokenizer, texts, num_workers=1, chunk_size=256, as_numpy=False):
+    """
+    Encodes `texts` into one flat ids buffer.
+    Returns (ids array('i'), offsets array('q') of len(texts) + 1), or NumPy
+    views of the same memory (int32, int64) with as_numpy=True.
+    """
+    ids = array('i')
+    offsets = array('q', [0])
+    if num_workers == 1:
+        # array.fromlist converts a whole list in C: faster than extending id by id
+        for text in texts:
+            ids.fromlist(tokenizer.encode(text))
+            offsets.append(len(ids))
+    else:
+        # Workers send back compact arrays (tokenizer._encode_array) rather than lists of ints
+        for part in map_batch(tokenizer, "_encode_array", texts, num_workers=num_workers, chunk_size=chunk_size):
+            ids.extend(part)
+            offsets.append(len(ids))
+
+    if as_numpy:
+        import numpy as np
+        return np.frombuffer(ids, dtype=np.int32), np.frombuffer(offsets, dtype=np.int64)
+    return ids, offsets
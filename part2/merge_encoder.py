@@ -0,0 +1,58 @@
+import heapq
+
+# -----------------------------------------------------------------------------
+# Rank-based encoding with learned merges
+# -----------------------------------------------------------------------------
+
+def apply_merges(ids, merges):
+    """
+    Apply learned merges to a sequence of token ids, lowest rank first.
+    merges: A dictionary { (id1, id2): new_id }. The new id doubles as the merge rank,
+    since merges learned earlier always get smaller ids.
+
+    The sequence is kept as a doubly linked list over the original positions and
+    the candidate pairs sit in a heap ordered by (rank, position), so each merge
+    costs O(log n) instead of a rescan of the whole sequence. Equal ranks are
+    merged left to right, which gives the same output as merging every occurrence
+    of the earliest learned pair and starting over.
+    """
+    tokens = list(ids)
+    n = len(tokens)
+    if n < 2:
+        return tokens
+    if n == 2:
+        new_id = merges.get((tokens[0], tokens[1]))
+        return tokens if new_id is None else [new_id]
+
+    nxt = list(range(1, n + 1))
+    prv = list(range(-1, n - 1))
+    heap = []
+    for i in range(n - 1):
+        rank = merges.get((tokens[i], tokens[i + 1]))
+        if rank is not None:
+            heap.append((rank, i))
+    heapq.heapify(heap)
+
+    while heap:
+        rank, i = heapq.heappop(heap)
+        j = nxt[i]
+        # Skip entries whose left or right token has changed since they were pushed
+        if tokens[i] is None or j >= n or merges.get((tokens[i], tokens[j])) != rank:
+            continue
+
+        tokens[i] = rank
+        tokens[j] = None
+        k = nxt[j]
+        nxt[i] = k
+        if k < n:
+            prv[k] = i
+            new_rank = merges.get((rank, tokens[k]))
+            if new_rank is not None:
+                heapq.heappush(heap, (new_rank, i))
+        p = prv[i]
+        if p >= 0:
+            new_rank = merges.get((tokens[p], rank))
+            if new_rank is not None:
+                heapq.heappush(heap, (new_rank, p))
+
+    return [t for t in tokens if t is not None]
@@ -0,0 +1,83 @@
+import heapq
+
+# -----------------------------------------------------------------------------
+# Best-pair selection for BPE training (lazy-deletion max-heap)
+# -----------------------------------------------------------------------------
+
+class MergeQueue:
+    """
+    Max-heap of (count, key, pair) entries used to pick the next merge in O(log P).
+
+    Counts change after every merge, but heap entries are never updated in place:
+    push() adds a fresh entry and the old one goes stale. An entry is only trusted
+    when it still matches the live count (and key) tables, so stale entries are
+    dropped when they reach the top (lazy deletion).
+
+    key: orders pairs sharing a count, lowest first, straight from the heap. The
+    training indexes use the index of the first sequence holding the pair, which
+    only changes when the pair's count does, so it never goes stale on its own.
+    Pairs equal in both count and key come off together and go through tie_key.
+    """
+
+    def __init__(self, counts, keys=None):
+        if keys is None:
+            self.heap = [(-count, 0, pair) for pair, count in counts.items()]
+        else:
+            self.heap = [(-count, keys[pair], pair) for pair, count in counts.items()]
+        heapq.heapify(self.heap)
+
+    def __len__(self):
+        return len(self.heap)
+
+    def push(self, pair, count, key=0):
+        heapq.heappush(self.heap, (-count, key, pair))
+
+    def pop_best(self, counts, keys=None, tie_key=None, tie_keys=None):
+        """
+        Remove and return the pair with the highest live count, or None if empty.
+        counts: the live { pair: count } table the entries are checked against.
+        keys: the live { pair: key } table, when entries were pushed with keys.
+        tie_key: orders pairs sharing the best count and key (lowest wins).
+        Without it the smallest pair wins, so selection is always deterministic.
+        tie_keys: like tie_key, but called once with the list of all tied pairs
+        and returning their keys in the same order (one round trip when the keys
+        live in other processes).
+        """
+        heap = self.heap
+
+        def live(entry):
+            count, key, pair = entry
+            return counts.get(pair) == -count and (keys is None or keys.get(pair) == key)
+
+        while heap and not live(heap[0]):
+            heapq.heappop(heap)
+        if not heap:
+            return None
+
+        best = heap[0][:2]
+        ties = set()
+        while heap and heap[0][:2] == best:
+            entry = heapq.heappop(heap)
+            if live(entry):
+                ties.add(entry[2])
+
+        if len(ties) == 1:
+            winner = next(iter(ties))
+        elif tie_keys is not None:
+            tied = list(ties)
+            winner = min(zip(tie_keys(tied), tied))[1]
+        elif tie_key is not None:
+            winner = min(ties, key=tie_key)
+        else:
+            winner = min(ties)
+        for pair in ties:
+            if pair != winner:
+                heapq.heappush(heap, best + (pair,))
+
+        # Stale entries pile up over a long run; rebuild from the live table when
+        # they clearly outnumber the live pairs
+        if len(heap) > 4 * len(counts) + 1024:
+            self.heap = [(-count, 0 if keys is None else keys[pair], pair)
+                         for pair, count in counts.items() if pair != winner]
+            heapq.heapify(self.heap)
+        return winner
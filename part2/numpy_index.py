@@ -0,0 +1,218 @@
+import numpy as np
+
+try:
+    from .merge_queue import MergeQueue
+except ImportError:
+    from merge_queue import MergeQueue
+
+# -----------------------------------------------------------------------------
+# Vectorized (NumPy) pair statistics for BPE training
+# -----------------------------------------------------------------------------
+
+# Pairs are packed into one int64 code: a * PAIR_BASE + b
+PAIR_BASE = 1 << 32
+
+
+def pair_counts(codes, weights, seqs):
+    """
+    Sums `weights` per distinct pair code, and takes the smallest of `seqs` (the
+    sequence index of every code). Returns (unique_codes, totals, first_seqs).
+    """
+    uniq, inverse = np.unique(codes, return_inverse=True)
+    totals = np.bincount(inverse, weights=weights, minlength=len(uniq)).astype(np.int64)
+    first = np.full(len(uniq), np.iinfo(np.int64).max)
+    np.minimum.at(first, inverse, seqs)
+    return uniq, totals, first
+
+
+class NumpyPairIndex:
+    """
+    Same interface as PairIndex, backed by NumPy arrays instead of Python loops.
+
+    All sequences are held in one int32 array `ids`, with `seq` giving the sequence
+    index of every position and `weight` its frequency. Initial pair counts come
+    from one vectorized pass over the pair codes (ids[i] * PAIR_BASE + ids[i+1]);
+    each merge then finds its sites with a vectorized mask, computes the count
+    deltas around those sites in one np.unique/np.bincount call, and compacts the
+    arrays. Selection goes through the same MergeQueue as the pure-Python index,
+    keyed by the same first[] sequence indices, so both produce the same merge list.
+
+    sequences: A dictionary { (tuple_of_ids or bytes): frequency }, in corpus order.
+    """
+
+    def __init__(self, sequences):
+        lengths = np.fromiter((len(ids) for ids in sequences), dtype=np.int64, count=len(sequences))
+        self.freqs = np.fromiter(sequences.values(), dtype=np.int64, count=len(sequences))
+        self.ids = np.fromiter((t for ids in sequences for t in ids), dtype=np.int32,
+                               count=int(lengths.sum()))
+        self.seq = np.repeat(np.arange(len(sequences), dtype=np.int32), lengths)
+        self.weight = self.freqs[self.seq]
+        # Total tokens over all sequences, weighted by frequency
+        self.num_tokens = int(self.weight.sum())
+
+        codes, weights, seqs = self._all_pairs()
+        uniq, totals, first = pair_counts(codes, weights, seqs)
+        self.pairs = {}
+        self.first = {}  # index of the first sequence that contains each pair
+        for c, n, f in zip(uniq.tolist(), totals.tolist(), first.tolist()):
+            if n > 0:
+                pair = (c >> 32, c & 0xFFFFFFFF)
+                self.pairs[pair] = n
+                self.first[pair] = f
+        self.queue = MergeQueue(self.pairs, self.first)
+
+    def __len__(self):
+        return len(self.freqs)
+
+    def _all_pairs(self):
+        ids = self.ids.astype(np.int64)
+        same = self.seq[:-1] == self.seq[1:]
+        return (ids[:-1] * PAIR_BASE + ids[1:])[same], self.weight[:-1][same], self.seq[:-1][same]
+
+    def _matches(self, pair):
+        """Start positions of every (possibly overlapping) occurrence of `pair`."""
+        a, b = pair
+        ids = self.ids
+        hit = (ids[:-1] == a) & (ids[1:] == b) & (self.seq[:-1] == self.seq[1:])
+        return np.flatnonzero(hit)
+
+    def _find_from(self, pair, start):
+        """
+        Flat position of the first occurrence of `pair` at or after `start`, or None.
+        Scans in growing chunks, so a nearby occurrence costs far less than _matches().
+        """
+        a, b = pair
+        ids = self.ids
+        seq = self.seq
+        n = len(ids)
+        size = 4096
+        while start < n - 1:
+            end = min(n, start + size + 1)
+            hit = (ids[start:end - 1] == a) & (ids[start + 1:end] == b) & (seq[start:end - 1] == seq[start + 1:end])
+            k = int(hit.argmax())
+            if hit[k]:
+                return start + k
+            start = end - 1
+            size *= 2
+        return None
+
+    def first_occurrence(self, pair):
+        """
+        Flat position of the first occurrence: sequences are stored in corpus order.
+        Only needed for ties between pairs that first occur in the same sequence.
+        """
+        return self._find_from(pair, int(np.searchsorted(self.seq, self.first[pair])))
+
+    def best_pair(self):
+        """
+        Most frequent pair (ties go to the pair seen first), or None when no pairs remain.
+        The pair is taken off the queue, so it is expected to be merged next.
+        """
+        return self.queue.pop_best(self.pairs, self.first, tie_key=self.first_occurrence)
+
+    def merge(self, pair, new_id):
+        """
+        Replace every occurrence of `pair` with `new_id`, left to right without overlap.
+        Returns the number of sequences that were rewritten.
+        """
+        a, b = pair
+        pos = self._matches(pair)
+        if len(pos) == 0:
+            return 0
+        if a == b:
+            # In a run like "a a a a" only every other start is merged
+            run_start = np.ones(len(pos), dtype=bool)
+            run_start[1:] = pos[1:] != pos[:-1] + 1
+            first = np.maximum.accumulate(np.where(run_start, np.arange(len(pos)), 0))
+            pos = pos[(np.arange(len(pos)) - first) % 2 == 0]
+
+        ids = self.ids
+        seq = self.seq
+        n = len(ids)
+        w = self.weight[pos]
+        selected = np.zeros(n + 2, dtype=bool)
+        selected[pos] = True
+
+        codes = [np.full(len(pos), a * PAIR_BASE + b, dtype=np.int64)]
+        deltas = [-w]
+        sites = [seq[pos]]
+
+        # Left neighbours: (x, a) -> (x, new), or (new, new) after an adjacent merge
+        has_left = pos > 0
+        has_left[has_left] = seq[pos[has_left] - 1] == seq[pos[has_left]]
+        lp = pos[has_left]
+        lw = w[has_left]
+        after_merge = (lp >= 2) & selected[np.maximum(lp - 2, 0)]
+        old_left = ids[lp - 1].astype(np.int64)
+        keep = ~after_merge
+        codes.append(old_left[keep] * PAIR_BASE + a)
+        deltas.append(-lw[keep])
+        sites.append(seq[lp[keep]])
+        new_left = np.where(after_merge, new_id, old_left)
+        codes.append(new_left * PAIR_BASE + new_id)
+        deltas.append(lw)
+        sites.append(seq[lp])
+
+        # Right neighbours: (b, y) -> (new, y), unless another merge starts at y
+        has_right = pos + 2 < n
+        has_right[has_right] = seq[pos[has_right] + 2] == seq[pos[has_right]]
+        rp = pos[has_right]
+        rw = w[has_right]
+        right = ids[rp + 2].astype(np.int64)
+        codes.append(b * PAIR_BASE + right)
+        deltas.append(-rw)
+        sites.append(seq[rp])
+        keep = ~selected[rp + 2]
+        codes.append(new_id * PAIR_BASE + right[keep])
+        deltas.append(rw[keep])
+        sites.append(seq[rp[keep]])
+
+        uniq, totals, site_first = pair_counts(np.concatenate(codes), np.concatenate(deltas),
+                                               np.concatenate(sites))
+        pairs = self.pairs
+        first = self.first
+        changed = []
+        recheck = []
+        for code, delta, f in zip(uniq.tolist(), totals.tolist(), site_first.tolist()):
+            if delta == 0:
+                continue
+            p = (code >> 32, code & 0xFFFFFFFF)
+            count = pairs.get(p, 0) + delta
+            if count <= 0:
+                pairs.pop(p, None)
+                first.pop(p, None)
+                continue
+            pairs[p] = count
+            changed.append(p)
+            if delta > 0:
+                first[p] = f  # a new pair: it only occurs at this merge's sites
+            elif f == first[p]:
+                recheck.append(p)  # occurrences were removed from its first sequence
+        pairs.pop(pair, None)
+        first.pop(pair, None)
+
+        # Apply the merge: write the new id at each site and drop the right halves
+        ids[pos] = new_id
+        keep = np.ones(n, dtype=bool)
+        keep[pos + 1] = False
+        self.ids = ids[keep]
+        self.seq = seq[keep]
+        self.weight = self.weight[keep]
+        self.num_tokens -= int(w.sum())
+
+        # A pair that lost occurrences can only move to a later sequence
+        for p in recheck:
+            start = self._find_from(p, int(np.searchsorted(self.seq, first[p])))
+            first[p] = int(self.seq[start])
+        for p in changed:
+            self.queue.push(p, pairs[p], first[p])
+        return len(np.unique(seq[pos]))
+
+    def sequences(self):
+        """Current state as a dictionary { (tuple_of_ids): frequency }, in corpus order."""
+        bounds = np.flatnonzero(np.diff(self.seq)) + 1
+        parts = np.split(self.ids, bounds)
+        return {tuple(part.tolist()): int(freq) for part, freq in zip(parts, self.freqs)}
+
+    def close(self):
+        pass
@@ -0,0 +1,49 @@
+from array import array
+from itertools import accumulate
+
+# -----------------------------------------------------------------------------
+# Token offsets for encode_with_offsets
+# -----------------------------------------------------------------------------
+#
+# The tokens of an encoded text are its UTF-8 bytes cut into consecutive pieces,
+# so their spans follow from the running sum of the token lengths. For
+# unit="char" a byte span is widened to whole characters: a token that starts
+# or ends inside a multi-byte character covers that whole character.
+
+UNITS = ("byte", "char")
+
+
+def check_unit(unit):
+    if unit not in UNITS:
+        raise ValueError(f"Unknown offset unit: {unit!r} (expected 'byte' or 'char')")
+
+
+def char_index(text):
+    """array('q') mapping every byte offset of text.encode('utf-8') to its character index."""
+    index = array('q')
+    for i, ch in enumerate(text):
+        if ch < "\x80":
+            index.append(i)
+        elif ch < "\u0800":
+            index.extend((i, i))
+        elif ch < "\U00010000":
+            index.extend((i, i, i))
+        else:
+            index.extend((i, i, i, i))
+    return index
+
+
+def token_spans(ids, tokens, text, unit="byte"):
+    """
+    (starts, ends) arrays('q') of the tokens `ids` that encode `text`, in order.
+    tokens: id -> token bytes (TokenTable.tokens).
+    """
+    check_unit(unit)
+    bounds = array('q', accumulate(map(len, map(tokens.__getitem__, ids)), initial=0))
+    starts = bounds[:-1]
+    ends = bounds[1:]
+    if unit == "char" and not text.isascii():
+        chars = char_index(text)
+        starts = array('q', map(chars.__getitem__, starts))
+        ends = array('q', [chars[end - 1] + 1 for end in ends])
+    return starts, ends
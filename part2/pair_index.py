@@ -0,0 +1,254 @@
+from array import array
+from collections import defaultdict
+from functools import partial
+
+try:
+    from .merge_queue import MergeQueue
+except ImportError:
+    from merge_queue import MergeQueue
+
+# -----------------------------------------------------------------------------
+# Incremental pair statistics for BPE training
+# -----------------------------------------------------------------------------
+
+class PairIndex:
+    """
+    Keeps the adjacent-pair counts of a sequence vocabulary up to date across merges.
+
+    Instead of recounting every pair after each merge (get_stats), we keep:
+      - pairs: { (id1, id2): frequency } over all sequences
+      - where: { (id1, id2): array of sequence indices that may contain the pair }
+      - first: { (id1, id2): index of the first sequence that contains the pair }
+    A merge only visits the sequences listed in where[pair], so its cost scales
+    with the number of affected occurrences rather than the vocabulary size.
+    The next pair to merge is taken from a MergeQueue in O(log P), keyed by
+    first[] so that ties on the count need no extra work (see first_occurrence).
+
+    All sequences live back to back in one flat array('I') buffer; sequence k
+    occupies buf[starts[k] : starts[k] + lengths[k]]. Merges only shrink a
+    sequence, so they are applied in place inside its slot. The postings in
+    where[] are compact array('I') lists too; they are allowed to go stale
+    (or repeat) and are checked against the buffer when used.
+
+    sequences: A dictionary { (tuple_of_ids or bytes): frequency }, in corpus order.
+    """
+
+    def __init__(self, sequences):
+        self.buf = array('I')
+        self.starts = array('Q')
+        self.lengths = array('Q')
+        self.freqs = array('Q')
+        self.pairs = defaultdict(int)
+        self.where = defaultdict(partial(array, 'I'))
+        # Total tokens over all sequences, weighted by frequency
+        self.num_tokens = 0
+
+        buf = self.buf
+        for idx, (ids, freq) in enumerate(sequences.items()):
+            self.num_tokens += len(ids) * freq
+            self.starts.append(len(buf))
+            self.lengths.append(len(ids))
+            self.freqs.append(freq)
+            buf.extend(ids)
+            for pair in zip(ids, ids[1:]):
+                self.pairs[pair] += freq
+            for pair in set(zip(ids, ids[1:])):
+                self.where[pair].append(idx)
+
+        # Postings are still in corpus order here, so the first one is the earliest
+        self.first = {pair: postings[0] for pair, postings in self.where.items()}
+        self.queue = MergeQueue(self.pairs, self.first)
+
+    def __len__(self):
+        return len(self.starts)
+
+    def sequence(self, idx):
+        """Current ids of sequence `idx` as an array('I')."""
+        start = self.starts[idx]
+        return self.buf[start:start + self.lengths[idx]]
+
+    def first_occurrence(self, pair):
+        """
+        Position (sequence index, offset) of the first occurrence of `pair`.
+        This is the order in which get_stats() would first insert the pair,
+        so it reproduces the tie-breaking of max(pairs, key=pairs.get).
+        The queue already orders ties by the sequence index (first[]); the offset
+        is only looked up for pairs that first occur in the same sequence.
+        """
+        return self._find(pair, self.first[pair])
+
+    def _first_sequence(self, pair):
+        """Index of the first sequence that still contains `pair`, dropping stale postings."""
+        candidates = sorted(set(self.where[pair]))
+        for k, idx in enumerate(candidates):
+            if self._find(pair, idx) is not None:
+                self.where[pair] = array('I', candidates[k:])
+                return idx
+        raise KeyError(pair)
+
+    def _find(self, pair, idx):
+        """(idx, offset) of the first occurrence of `pair` in sequence `idx`, or None."""
+        a, b = pair
+        buf = self.buf
+        start = self.starts[idx]
+        end = start + self.lengths[idx]
+        i = start
+        while True:
+            try:
+                i = buf.index(a, i, end - 1)
+            except ValueError:
+                return None
+            if buf[i + 1] == b:
+                return idx, i - start
+            i += 1
+
+    def best_pair(self):
+        """
+        Most frequent pair (ties go to the pair seen first), or None when no pairs remain.
+        The pair is taken off the queue, so it is expected to be merged next.
+        """
+        return self.queue.pop_best(self.pairs, self.first, tie_key=self.first_occurrence)
+
+    def merge(self, pair, new_id):
+        """
+        Replace every occurrence of `pair` with `new_id` in the sequences that contain it.
+        Returns the number of sequences that were rewritten.
+        """
+        delta, rewritten = self._merge_sequences(pair, new_id)
+        self._apply_delta(delta, rewritten)
+        pairs = self.pairs
+        for p, d in delta.items():
+            if d and p in pairs:
+                self.queue.push(p, pairs[p], self.first[p])
+        return len(rewritten)
+
+    def _apply_delta(self, delta, rewritten):
+        """
+        Folds the count changes of a merge into pairs / where / first.
+        Only pairs with a non-zero change gained or lost occurrences: a gain is
+        always a brand-new pair (it contains the new id), whose postings hold
+        just this merge's sequences; a loss can only move first[] later, and
+        only if the pair's first sequence was rewritten.
+        """
+        pairs = self.pairs
+        first = self.first
+        rewritten = set(rewritten)
+        for p, d in delta.items():
+            count = pairs.get(p, 0) + d
+            if count > 0:
+                pairs[p] = count
+                if d > 0:
+                    first[p] = min(self.where[p])
+                elif d < 0 and first[p] in rewritten and self._find(p, first[p]) is None:
+                    first[p] = self._first_sequence(p)
+            else:
+                pairs.pop(p, None)
+                self.where.pop(p, None)
+                first.pop(p, None)
+
+    def _merge_sequences(self, pair, new_id):
+        """
+        Rewrites the sequences and returns ({ pair: count change }, indices of the
+        sequences that were rewritten).
+        Only the pairs around each merge site change, so counts are adjusted locally:
+        for "x a b y" we drop (x, a), (a, b), (b, y) and add (x, new), (new, y).
+        """
+        buf = self.buf
+        where = self.where
+        a, b = pair
+        delta = defaultdict(int)
+        delta[pair] = 0
+        rewritten = []
+
+        for idx in where.pop(pair, ()):
+            start = self.starts[idx]
+            end = start + self.lengths[idx]
+            freq = self.freqs[idx]
+            # Compact in place: r reads the old ids, w writes the new ones (w <= r),
+            # so old ids at positions >= r are still intact when we look at them
+            r = w = i = start
+            last_end = -1
+            added = set()
+
+            while True:
+                try:
+                    i = buf.index(a, i, end - 1)
+                except ValueError:
+                    break
+                if buf[i + 1] != b:
+                    i += 1
+                    continue
+
+                if r < i:
+                    if w != r:
+                        buf[w:w + i - r] = buf[r:i]
+                    w += i - r
+                if i > start:
+                    # (left, a) was already dropped if the previous merge ended here
+                    if last_end != i:
+                        delta[buf[i - 1], a] -= freq
+                    left_pair = (buf[w - 1], new_id)
+                    delta[left_pair] += freq
+                    if left_pair not in added:
+                        added.add(left_pair)
+                        where[left_pair].append(idx)
+                delta[pair] -= freq
+                if i + 2 < end:
+                    right = buf[i + 2]
+                    delta[b, right] -= freq
+                    # If the pair starts again right here, that merge adds (new, new)
+                    if not (right == a and i + 3 < end and buf[i + 3] == b):
+                        right_pair = (new_id, right)
+                        delta[right_pair] += freq
+                        if right_pair not in added:
+                            added.add(right_pair)
+                            where[right_pair].append(idx)
+
+                buf[w] = new_id
+                w += 1
+                i += 2
+                r = last_end = i
+
+            if last_end < 0:
+                continue  # stale entry: the pair no longer occurs in this sequence
+            if r < end:
+                if w != r:
+                    buf[w:w + end - r] = buf[r:end]
+                w += end - r
+            self.lengths[idx] = w - start
+            self.num_tokens -= (end - w) * freq
+            rewritten.append(idx)
+        return delta, rewritten
+
+    def sequences(self):
+        """Current state as a dictionary { (tuple_of_ids): frequency }, in corpus order."""
+        return {tuple(self.sequence(idx)): self.freqs[idx] for idx in range(len(self))}
+
+    def close(self):
+        pass
+
+
+def make_pair_index(sequences, backend="python", num_workers=1):
+    """
+    Builds the training index for `sequences` with the chosen backend:
+      - "python":  PairIndex (pure Python, incremental)
+      - "numpy":   NumpyPairIndex (vectorized; needs NumPy installed)
+      - "sharded": ShardedPairIndex (sequences split over `num_workers` processes)
+    All of them learn exactly the same merges. Call close() on the index when done.
+    """
+    if backend == "python":
+        return PairIndex(sequences)
+    if backend == "numpy":
+        try:
+            from .numpy_index import NumpyPairIndex
+        except ImportError:
+            from numpy_index import NumpyPairIndex
+        return NumpyPairIndex(sequences)
+    if backend == "sharded":
+        try:
+            from .sharded_index import ShardedPairIndex
+        except ImportError:
+            from sharded_index import ShardedPairIndex
+        return ShardedPairIndex(sequences, num_workers=num_workers)
+    raise ValueError(f"Unknown training backend: {backend!r} (expected 'python', 'numpy' or 'sharded')")
+
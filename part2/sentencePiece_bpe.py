@@ -1,6 +1,20 @@
+import time
 from collections import Counter, defaultdict
 
-class SentencePieceBPE:
+try:
+    from .pair_index import make_pair_index
+    from .tokenizer_base import TokenizerMixin
+    from .train_metrics import MergeStats
+    from .merge_encoder import apply_merges
+    from .corpus import split_lines
+except ImportError:
+    from pair_index import make_pair_index
+    from tokenizer_base import TokenizerMixin
+    from train_metrics import MergeStats
+    from merge_encoder import apply_merges
+    from corpus import split_lines
+
+class SentencePieceBPE(TokenizerMixin):
     def __init__(self):
         self.merges = {}  # (byte1, byte2) -> new_token_id
         # Initialize base vocab with all 256 UTF-8 bytes
@@ -35,82 +49,103 @@ class SentencePieceBPE:
                 i += 1
         return new_ids
 
-    def train(self, text, num_merges=50):
+    def train(self, text, num_merges=50, backend="python", verbose=True, callback=None, num_workers=1,
+              vocab_size=None, min_frequency=None):
         """
         Train BPE without pre-tokenization.
         We treat the input as a list of sentences (split by newline for efficiency),
         but we DO NOT split by words/punctuation.
+        text: one string, or an iterable of lines.
+        num_merges: maximum number of merges (fewer if the pairs run out).
+        vocab_size: train up to this vocabulary size instead of num_merges merges.
+        min_frequency: stop as soon as the best pair occurs fewer times than this.
+        backend: "python", "numpy" or "sharded" merge engine (same merges either way).
+        num_workers: number of shards (worker processes) with backend="sharded".
+        verbose: print progress and every merge.
+        callback: a TrainingCallback (see train_metrics) that receives the
+            timings of each training phase and per-merge MergeStats.
         """
         # 1. Initial Processing
         # We process line-by-line to use a Counter. 
         # This handles duplicates efficiently and keeps memory usage lower than one giant list.
-        lines = text.split('\n')
+        # Lines are produced lazily, so we never hold a second full copy of the corpus.
+        lines = split_lines(text) if isinstance(text, str) else text
+        self._invalidate_tables()
         
         # Convert each line directly to raw UTF-8 bytes
         # No regex splitting happens here!
+        # Lines are kept as bytes (one byte per id) rather than tuples of ints,
+        # and PairIndex packs them into a single array for the merge loop.
+        clock = time.perf_counter
+        t0 = clock()
         vocab = Counter()
         for line in lines:
             if line: # skip empty lines
-                vocab[tuple(line.encode('utf-8'))] += 1
+                vocab[line.encode('utf-8')] += 1
                 
-        print(f"Training on {len(vocab)} unique sentences/lines...")
+        if verbose:
+            print(f"Training on {len(vocab)} unique sentences/lines...")
 
         # 2. Iterative Merging
-        for i in range(num_merges):
-            stats = self.get_stats(vocab)
-            if not stats:
-                break
-            
-            # Find most frequent pair
-            pair = max(stats, key=stats.get)
+        # Pair counts are updated incrementally and the best pair comes off a heap,
+        # so we never rescan every sequence (see PairIndex / MergeQueue)
+        t1 = clock()
+        index = make_pair_index(vocab, backend=backend, num_workers=num_workers)
+        num_bytes = index.num_tokens
+        if vocab_size is not None:
+            num_merges = max(0, vocab_size - self.vocab_size)
+        try:
+            if callback is not None:
+                callback.on_start(len(vocab), t1 - t0, clock() - t1)
+            for i in range(num_merges):
+                # Find most frequent pair
+                t0 = clock()
+                pair = index.best_pair()
+                t1 = clock()
+                if pair is None:
+                    break
+                count = index.pairs.get(pair, 0)
+                if min_frequency is not None and count < min_frequency:
+                    if verbose:
+                        print(f"Stopping after {i} merges: best pair occurs {count} < {min_frequency} times")
+                    break
             
-            # Create new token
-            new_id = self.vocab_size
-            self.merges[pair] = new_id
-            self.id_to_bytes[new_id] = self.id_to_bytes[pair[0]] + self.id_to_bytes[pair[1]]
-            self.vocab_size += 1
+                # Create new token
+                new_id = self.vocab_size
+                self.merges[pair] = new_id
+                self.id_to_bytes[new_id] = self.id_to_bytes[pair[0]] + self.id_to_bytes[pair[1]]
+                self.vocab_size += 1
             
-            # Apply merge to all sequences in our vocab
-            # We rebuild the dictionary because keys (sequences) change
-            new_vocab = Counter()
-            for ids, count in vocab.items():
-                new_sequence = tuple(self.merge_ids(list(ids), pair, new_id))
-                new_vocab[new_sequence] += count
-            vocab = new_vocab
+                # Apply merge to the sequences that contain the pair
+                t2 = clock()
+                touched = index.merge(pair, new_id)
+                t3 = clock()
             
-            # Visualization: repr() shows the byte string (e.g. b'e ')
-            print(f"Merge {i+1}: {pair} -> {new_id} ({repr(self.id_to_bytes[new_id])})")
+                # Visualization: repr() shows the byte string (e.g. b'e ')
+                if verbose:
+                    print(f"Merge {i+1}: {pair} -> {new_id} ({repr(self.id_to_bytes[new_id])})")
+                if callback is not None:
+                    tokens = index.num_tokens
+                    callback.on_merge(MergeStats(i + 1, pair, new_id, count, touched, t1 - t0, t3 - t2,
+                                                 tokens, num_bytes / tokens))
+            if callback is not None:
+                callback.on_end()
+        finally:
+            index.close()
 
     def encode(self, text):
         """
         Encodes text by converting to bytes and applying learned merges.
         """
-        # Convert entire text to bytes
-        ids = list(text.encode('utf-8'))
-        
-        # Apply merges strictly in order of learning
-        while True:
-            stats = self.get_stats({tuple(ids): 1})
-            
-            # Find the earliest learned merge that applies to this sequence
-            best_pair = None
-            min_merge_id = float('inf')
-            
-            # Check which of the current adjacent pairs are in our merge list
-            for pair in stats:
-                if pair in self.merges:
-                    # We want the merge that resulted in the smallest ID 
-                    if self.merges[pair] < min_merge_id:
-                        min_merge_id = self.merges[pair]
-                        best_pair = pair
-            
-            if best_pair:
-                ids = self.merge_ids(ids, best_pair, self.merges[best_pair])
-            else:
-                break
-                
-        return ids
+        # Convert entire text to bytes, then apply merges strictly in order of learning:
+        # a linked list + heap of candidate pairs always merges the earliest learned
+        # pair next, in O(n log n) instead of rescanning the whole text per merge
+        return apply_merges(text.encode('utf-8'), self.merges)
 
-    def decode(self, ids):
-        b = b"".join([self.id_to_bytes[idx] for idx in ids])
-        return b.decode('utf-8', errors='replace')
\ No newline at end of file
+    def encode_greedy(self, text):
+        """
+        Approximate encode(): the text is cut into the longest vocabulary tokens
+        left to right (TokenTrie), ignoring merge order. The ids can differ from
+        encode(); see trie_encoder.greedy_divergence.
+        """
+        return self.token_trie().encode(text.encode('utf-8'))
@@ -1,4 +1,5 @@
 from sentencePiece_bpe import SentencePieceBPE
+from pair_index import PairIndex
 
 class SP_BPE_Test_Suite:
     def __init__(self):
@@ -111,6 +112,173 @@ def run_suite():
         return sp.decode(encoded) == "Line 2"
     tester.run_check("Multiline string training", test_multiline_training)
 
+    def test_batch_encode_parallel():
+        # Process-pool batch results must match one-by-one encoding, in input order
+        sp = SentencePieceBPE()
+        sp.train("the cat sat on the mat\nthe dog sat on the log", num_merges=10)
+        texts = [f"the cat {i} sat" for i in range(40)]
+        batch = sp.encode_batch(texts, num_workers=2, chunk_size=8)
+        return batch == [sp.encode(t) for t in texts] and sp.decode_batch(batch) == texts
+    tester.run_check("Batch encode/decode over a process pool", test_batch_encode_parallel)
+
+    def test_streaming_training():
+        # Training from a lazily read file must learn the same merges as the joined string
+        import os, tempfile
+        lines = ["the cat sat", "the cat ran", "", "a dog sat"]
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "corpus.txt")
+            with open(path, "w", encoding="utf-8") as f:
+                f.write("\n".join(lines) + "\n")
+            streamed = SentencePieceBPE()
+            streamed.train_from_files([path], num_merges=8)
+        reference = SentencePieceBPE()
+        reference.train("\n".join(lines), num_merges=8)
+        return streamed.merges == reference.merges
+    tester.run_check("Streaming training from files", test_streaming_training)
+
+    def test_in_place_merging():
+        # Lines are packed into one buffer; merges rewrite only lines containing the pair
+        index = PairIndex({b"abab xy": 2, b"cdcd": 1, b"aaaa": 1})
+        touched = index.merge((ord("a"), ord("b")), 256)
+        return (touched == 1
+                and index.sequences() == {(256, 256, 32, 120, 121): 2, tuple(b"cdcd"): 1, tuple(b"aaaa"): 1}
+                and index.pairs[(256, 256)] == 2 and (ord("b"), ord("a")) not in index.pairs)
+    tester.run_check("Compact buffer with in-place merging", test_in_place_merging)
+
+    def test_heap_encoder_matches_reference():
+        # The heap-based encoder must match repeatedly merging the earliest learned pair
+        sp = SentencePieceBPE()
+        sp.train("the cat sat on the mat\naaaa aaa the end\n" * 3, num_merges=25)
+        text = "the mat sat on aaaaaaa cats at the end " * 4
+        ids = list(text.encode('utf-8'))
+        while True:
+            present = [p for p in sp.get_stats({tuple(ids): 1}) if p in sp.merges]
+            if not present:
+                break
+            pair = min(present, key=sp.merges.get)
+            ids = sp.merge_ids(ids, pair, sp.merges[pair])
+        return sp.encode(text) == ids
+    tester.run_check("Heap-based encoder matches the reference merge loop", test_heap_encoder_matches_reference)
+
+    def test_save_load_roundtrip():
+        # A saved tokenizer must reload with the same tables, and refuse the wrong class
+        import os, tempfile
+        from bpe import BPE_Tokenizer
+        sp = SentencePieceBPE()
+        sp.train("the cat sat on the mat\nthe hat", num_merges=10)
+        with tempfile.TemporaryDirectory() as tmp:
+            path = os.path.join(tmp, "sp.tok")
+            sp.save(path)
+            loaded = SentencePieceBPE.load(path)
+            try:
+                BPE_Tokenizer.load(path)
+                wrong_kind = False
+            except ValueError:
+                wrong_kind = True
+        text = "the cat on the hat"
+        return (list(loaded.merges.items()) == list(sp.merges.items())
+                and loaded.id_to_bytes == sp.id_to_bytes
+                and loaded.encode(text) == sp.encode(text) and wrong_kind)
+    tester.run_check("Binary save/load round trip", test_save_load_roundtrip)
+
+    def test_stream_decode():
+        # Streaming decode, one id at a time, must rebuild the text exactly
+        sp = SentencePieceBPE()
+        sp.train("über straße\nüber alles", num_merges=8)
+        text = "straße über 東京"
+        stream = sp.stream_decoder()
+        return "".join(stream.decode([idx]) for idx in sp.encode(text)) + stream.flush() == text
+    tester.run_check("Streaming decoder across split characters", test_stream_decode)
+
+    def test_training_metrics():
+        # The callback sees every merge, with the merged pair's frequency
+        from train_metrics import TrainingMetrics
+        metrics = TrainingMetrics()
+        sp = SentencePieceBPE()
+        sp.train("abab\nabab\nab", num_merges=5, verbose=False, callback=metrics)
+        return ([m.pair for m in metrics.merges] == list(sp.merges)
+                and metrics.merges[0].count == 5 and metrics.merges[0].touched == 2)
+    tester.run_check("Training metrics callback", test_training_metrics)
+
+    def test_encode_with_offsets():
+        # Offsets run across the whole text, lines included
+        sp = SentencePieceBPE()
+        sp.train("the cat\nthe hat", num_merges=6)
+        text = "the cat\nthe ñ"
+        ids, starts, ends = sp.encode_with_offsets(text)
+        data = text.encode('utf-8')
+        _, cstarts, cends = sp.encode_with_offsets(text, unit="char")
+        return (list(ids) == sp.encode(text)
+                and [data[s:e] for s, e in zip(starts, ends)] == [sp.id_to_bytes[i] for i in ids]
+                and cends[-1] == len(text) and cstarts[-1] == cstarts[-2] == len(text) - 1)
+    tester.run_check("Encode with byte and character offsets", test_encode_with_offsets)
+
+    def test_encode_into_and_flat_batch():
+        # Ids written into a preallocated buffer / flat batch must match encode()
+        from array import array
+        sp = SentencePieceBPE()
+        sp.train("the cat sat\non the mat", num_merges=8)
+        texts = ["the cat", "on the mat", ""]
+        buf = array('i', [0] * 20)
+        n = sp.encode_into("the mat", buf, start=5)
+        ids, offsets = sp.encode_batch_flat(texts)
+        return (list(buf[5:5 + n]) == sp.encode("the mat")
+                and [list(ids[offsets[k]:offsets[k + 1]]) for k in range(len(texts))]
+                    == [sp.encode(t) for t in texts])
+    tester.run_check("Encode into preallocated buffers and flat batches", test_encode_into_and_flat_batch)
+
+    def test_greedy_trie_encoder():
+        # The greedy encoder must still cover the text exactly; identical output scores full agreement
+        from trie_encoder import greedy_divergence
+        sp = SentencePieceBPE()
+        sp.train("the cat sat\non the mat", num_merges=10)
+        text = "the mat sat on the cat"
+        report = greedy_divergence(sp, ["the cat", "the cat"])
+        same = sp.encode_greedy("the cat") == sp.encode("the cat")
+        return (sp.decode(sp.encode_greedy(text)) == text
+                and (report["token_agreement"] == 1.0) == same)
+    tester.run_check("Greedy longest-match trie encoder", test_greedy_trie_encoder)
+
+    def test_sharded_backend():
+        # Shards in worker processes must learn the same merges as one in-process index
+        text = "the cat sat\non the mat\naaaa aaa\nthe bat sat on the hat\nzz zz"
+        reference = SentencePieceBPE()
+        reference.train(text, num_merges=30, verbose=False)
+        sharded = SentencePieceBPE()
+        sharded.train(text, num_merges=30, backend="sharded", num_workers=2, verbose=False)
+        return list(sharded.merges.items()) == list(reference.merges.items())
+    tester.run_check("Sharded backend learns the same merges", test_sharded_backend)
+
+    def test_vocab_size_and_min_frequency():
+        # Training stops at the target size, or once the best pair gets too rare
+        sp = SentencePieceBPE()
+        sp.train("the cat sat\non the mat\nthe hat", verbose=False, vocab_size=260)
+        rare = SentencePieceBPE()
+        rare.train("the cat sat\non the mat\nthe hat", num_merges=50, verbose=False, min_frequency=3)
+        reference = SentencePieceBPE()
+        reference.train("the cat sat\non the mat\nthe hat", num_merges=len(rare.merges), verbose=False)
+        return (sp.vocab_size == 260 and 0 < len(rare.merges) < 50
+                and list(rare.merges.items()) == list(reference.merges.items()))
+    tester.run_check("Vocabulary size target and minimum pair frequency", test_vocab_size_and_min_frequency)
+
+    try:
+        import numpy  # noqa: F401  (optional dependency of the numpy backend)
+        HAS_NUMPY = True
+    except ImportError:
+        print("[!] NumPy not installed: skipping NumPy backend test")
+        HAS_NUMPY = False
+
+    def test_numpy_backend():
+        # The vectorized backend must learn the same merges as the pure-Python one
+        text = "the cat sat on the mat\naaaa aaa aa\nthe bat sat on the hat"
+        reference = SentencePieceBPE()
+        reference.train(text, num_merges=20)
+        vectorized = SentencePieceBPE()
+        vectorized.train(text, num_merges=20, backend="numpy")
+        return list(vectorized.merges.items()) == list(reference.merges.items())
+    if HAS_NUMPY:
+        tester.run_check("NumPy backend learns the same merges", test_numpy_backend)
+
     tester.summary()
 
 if __name__ == "__main__":
@@ -0,0 +1,242 @@
+import multiprocessing
+import os
+from bisect import bisect_right
+
+try:
+    from .pair_index import PairIndex
+    from .merge_queue import MergeQueue
+except ImportError:
+    from pair_index import PairIndex
+    from merge_queue import MergeQueue
+
+# -----------------------------------------------------------------------------
+# Sharded pair statistics for BPE training (one worker process per shard)
+# -----------------------------------------------------------------------------
+#
+# The sequence table is cut into contiguous shards, in corpus order, and each
+# shard lives in its own worker process as a ShardIndex (a PairIndex over just
+# those sequences). The coordinator only keeps the global pair counts and the
+# MergeQueue. For every merge it:
+#   1. picks the best pair from its queue; ties are settled by the global first
+#      occurrence = the first shard holding the pair, at its local position
+#   2. sends the merge to every shard, which rewrites its sequences in parallel
+#   3. sums the count changes the shards send back into the global counts, and
+#      refreshes the first sequence (the queue's tie key) of the changed pairs
+# so only per-merge count deltas cross process boundaries.
+
+
+class ShardIndex(PairIndex):
+    """PairIndex of one shard: applies merges locally and reports the count changes."""
+
+    def __init__(self, sequences):
+        super().__init__(sequences)
+        self.queue = None  # best-pair selection happens in the coordinator
+
+    def merge(self, pair, new_id):
+        """
+        Returns ({ pair: count change }, { pair: local first sequence, or None once
+        the shard no longer has it }, sequences touched, tokens removed).
+        """
+        num_tokens = self.num_tokens
+        delta, rewritten = self._merge_sequences(pair, new_id)
+        self._apply_delta(delta, rewritten)
+        changed = {p: d for p, d in delta.items() if d}
+        first = self.first
+        return changed, {p: first.get(p) for p in changed}, len(rewritten), num_tokens - self.num_tokens
+
+    def first_occurrences(self, pairs):
+        """Local first occurrence of each pair, or None where this shard does not have it."""
+        return [self.first_occurrence(p) if p in self.pairs else None for p in pairs]
+
+    def first_sequences(self, pairs):
+        """Local first sequence of each pair, or None where this shard does not have it."""
+        return [self.first.get(p) for p in pairs]
+
+
+def _shard_worker(conn, sequences):
+    try:
+        index = ShardIndex(sequences)
+        del sequences
+        conn.send((dict(index.pairs), index.first, index.num_tokens))
+        while True:
+            command, arg = conn.recv()
+            if command == "merge":
+                conn.send(index.merge(*arg))
+            elif command == "first":
+                conn.send(index.first_occurrences(arg))
+            elif command == "first_sequences":
+                conn.send(index.first_sequences(arg))
+            elif command == "sequences":
+                conn.send(index.sequences())
+            elif command == "close":
+                break
+    except Exception as e:  # reported to the coordinator, which raises it
+        conn.send(e)
+    finally:
+        conn.close()
+
+
+def split_shards(sequences, num_shards):
+    """Cuts { sequence: frequency } into contiguous shards of about the same total length."""
+    items = list(sequences.items())
+    total = sum(len(ids) for ids, _ in items)
+    shards = []
+    start = 0
+    done = 0
+    for k in range(1, num_shards + 1):
+        target = total * k // num_shards
+        end = start
+        while end < len(items) and (done < target or k == num_shards):
+            done += len(items[end][0])
+            end += 1
+        if end > start:
+            shards.append(dict(items[start:end]))
+        start = end
+    return shards
+
+
+class ShardedPairIndex:
+    """
+    Same interface as PairIndex, with the sequences spread over `num_workers`
+    worker processes (see the notes at the top of this module). Learns exactly
+    the same merges as PairIndex. Call close() to stop the workers.
+
+    sequences: A dictionary { (tuple_of_ids or bytes): frequency }, in corpus order.
+    """
+
+    def __init__(self, sequences, num_workers=None):
+        if num_workers is None:
+            num_workers = os.cpu_count() or 1
+        self.num_sequences = len(sequences)
+        self.conns = []
+        self.procs = []
+        self.offsets = []  # global index of each shard's first sequence
+        offset = 0
+        for shard in split_shards(sequences, max(1, num_workers)):
+            parent, child = multiprocessing.Pipe()
+            proc = multiprocessing.Process(target=_shard_worker, args=(child, shard), daemon=True)
+            proc.start()
+            child.close()
+            self.conns.append(parent)
+            self.procs.append(proc)
+            self.offsets.append(offset)
+            offset += len(shard)
+
+        self.pairs = {}
+        self.first = {}  # global index of the first sequence holding each pair
+        self.num_tokens = 0
+        for offset, (counts, first, num_tokens) in zip(self.offsets, self._gather()):
+            self.num_tokens += num_tokens
+            for pair, count in counts.items():
+                self.pairs[pair] = self.pairs.get(pair, 0) + count
+                if pair not in self.first:
+                    self.first[pair] = offset + first[pair]
+        self.queue = MergeQueue(self.pairs, self.first)
+
+    def __len__(self):
+        return self.num_sequences
+
+    def _broadcast(self, command, arg=None):
+        for conn in self.conns:
+            conn.send((command, arg))
+        return self._gather()
+
+    def _gather(self):
+        results = [conn.recv() for conn in self.conns]
+        for result in results:
+            if isinstance(result, Exception):
+                self.close()
+                raise result
+        return results
+
+    def first_occurrence(self, pair):
+        return self._first_occurrences([pair])[0]
+
+    def _first_occurrences(self, pairs):
+        """Global (sequence index, offset) of the first occurrence of each pair."""
+        keys = [None] * len(pairs)
+        for offset, found in zip(self.offsets, self._broadcast("first", pairs)):
+            for k, position in enumerate(found):
+                if keys[k] is None and position is not None:
+                    keys[k] = (offset + position[0], position[1])
+        return keys
+
+    def best_pair(self):
+        """
+        Most frequent pair (ties go to the pair seen first), or None when no pairs remain.
+        The pair is taken off the queue, so it is expected to be merged next.
+        """
+        return self.queue.pop_best(self.pairs, self.first, tie_keys=self._first_occurrences)
+
+    def merge(self, pair, new_id):
+        """
+        Merges `pair` in every shard and folds their count changes into the global counts.
+        Returns the number of sequences that were rewritten.
+        """
+        results = self._broadcast("merge", (pair, new_id))
+        totals = {}
+        touched = 0
+        for delta, _, shard_touched, removed in results:
+            touched += shard_touched
+            self.num_tokens -= removed
+            for p, d in delta.items():
+                totals[p] = totals.get(p, 0) + d
+
+        pairs = self.pairs
+        first = self.first
+        lost = []  # pairs gone from the shard that held their first occurrence
+        for p, d in totals.items():
+            count = pairs.get(p, 0) + d
+            if count <= 0:
+                pairs.pop(p, None)
+                first.pop(p, None)
+                continue
+            pairs[p] = count
+            if p not in first:
+                # A new pair: every shard holding it reported its first sequence
+                first[p] = min(offset + shard_first[p]
+                               for offset, (_, shard_first, _, _) in zip(self.offsets, results)
+                               if shard_first.get(p) is not None)
+                continue
+            # Shards are in corpus order, so the pair can only move to a later one
+            k = bisect_right(self.offsets, first[p]) - 1
+            shard_first = results[k][1]
+            if p not in shard_first:
+                continue
+            if shard_first[p] is not None:
+                first[p] = self.offsets[k] + shard_first[p]
+            else:
+                lost.append(p)
+        if lost:
+            found = [None] * len(lost)
+            for offset, shard_first in zip(self.offsets, self._broadcast("first_sequences", lost)):
+                for k, idx in enumerate(shard_first):
+                    if found[k] is None and idx is not None:
+                        found[k] = offset + idx
+            first.update(zip(lost, found))
+        pairs.pop(pair, None)
+        first.pop(pair, None)
+        for p in totals:
+            if p in pairs:
+                self.queue.push(p, pairs[p], first[p])
+        return touched
+
+    def sequences(self):
+        """Current state as a dictionary { (tuple_of_ids): frequency }, in corpus order."""
+        merged = {}
+        for part in self._broadcast("sequences"):
+            merged.update(part)
+        return merged
+
+    def close(self):
+        """Stops the worker processes."""
+        for conn, proc in zip(self.conns, self.procs):
+            if proc.is_alive():
+                try:
+                    conn.send(("close", None))
+                except (BrokenPipeError, OSError):
+                    pass
+            conn.close()
+            proc.join()
+        self.conns = []
+        self.procs = []
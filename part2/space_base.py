@@ -1,3 +1,14 @@
+import re
+from array import array
+
+try:
+    from .batch import map_batch
+except ImportError:
+    from batch import map_batch
+
+# Same tokens as str.split(): \s matches exactly the characters str.isspace() accepts
+TOKEN_RE = re.compile(r"\S+")
+
 class SpaceTokenizer:
     def encode(self, text):
         """
@@ -10,5 +21,31 @@ class SpaceTokenizer:
             list: A list of tokens obtained by splitting the text on spaces.
         """
         return text.split()
+    def encode_with_offsets(self, text):
+        """
+        Tokenizes like encode(), also reporting where every token came from.
+        Returns (tokens, starts array('q'), ends array('q')), with
+        text[starts[k]:ends[k]] == tokens[k] (character offsets).
+        """
+        tokens = []
+        starts = array('q')
+        ends = array('q')
+        for match in TOKEN_RE.finditer(text):
+            tokens.append(match.group())
+            starts.append(match.start())
+            ends.append(match.end())
+        return tokens, starts, ends
+
     def decode(self, tokens):
-        return " ".join(tokens)
\ No newline at end of file
+        return " ".join(tokens)
+
+    def encode_batch(self, texts, num_workers=1, chunk_size=256):
+        """
+        Encodes a list of texts, optionally sharded over `num_workers` processes.
+        Results come back in input order.
+        """
+        return map_batch(self, "encode", texts, num_workers=num_workers, chunk_size=chunk_size)
+
+    def decode_batch(self, batch, num_workers=1, chunk_size=256):
+        """Decodes a list of token lists (one per text), keeping input order."""
+        return map_batch(self, "decode", batch, num_workers=num_workers, chunk_size=chunk_size)
@@ -82,6 +82,23 @@ def run_tests():
         return encoded == ["Hello,", "world!"]
     t.run("Punctuation remains attached to words", test_punctuation_stickiness)
 
+    print("\n--- Batch API ---")
+
+    def test_batch_round_trip():
+        texts = [f"line {i} of text" for i in range(20)]
+        batch = tokenizer.encode_batch(texts, num_workers=2, chunk_size=4)
+        return batch == [tokenizer.encode(x) for x in texts] and tokenizer.decode_batch(batch) == texts
+    t.run("Batch encode/decode keeps input order", test_batch_round_trip)
+
+    print("\n--- Offsets ---")
+
+    def test_encode_with_offsets():
+        text = " Hello,\tworld!\n  naïve "
+        tokens, starts, ends = tokenizer.encode_with_offsets(text)
+        return (tokens == tokenizer.encode(text)
+                and [text[s:e] for s, e in zip(starts, ends)] == tokens)
+    t.run("Character offsets of every token", test_encode_with_offsets)
+
     t.summary()
 
 if __name__ == "__main__":
@@ -0,0 +1,87 @@
+import codecs
+from array import array
+
+# -----------------------------------------------------------------------------
+# Token byte table for decoding
+# -----------------------------------------------------------------------------
+
+class TokenTable:
+    """
+    Contiguous, id-indexed view of a tokenizer's id_to_bytes:
+      - tokens:  tuple of the bytes of every id (list indexing instead of dict lookups)
+      - blob:    all token bytes back to back
+      - offsets: array('I'), token i is blob[offsets[i]:offsets[i + 1]]
+    Built once per trained vocabulary and reused by every decode.
+    """
+
+    def __init__(self, id_to_bytes, vocab_size):
+        self.vocab_size = vocab_size
+        self.tokens = tuple(id_to_bytes[idx] for idx in range(vocab_size))
+        self.blob = b"".join(self.tokens)
+        self.offsets = array('I', [0])
+        end = 0
+        for token in self.tokens:
+            end += len(token)
+            self.offsets.append(end)
+        self._np_tables = None
+
+    def decode_bytes(self, ids):
+        """
+        Concatenated bytes of `ids` (list, array('i'), NumPy integer array, ...).
+        NumPy input is gathered from the blob in one vectorized pass into a
+        preallocated bytearray; anything else is joined from the token tuple,
+        which also sizes its output once up front.
+        Raises KeyError for an id outside 0 <= id < vocab_size, like the
+        id_to_bytes lookup it replaces (negative ids must not wrap around).
+        """
+        if type(ids).__module__ == "numpy":
+            return self._gather(ids)
+        if not isinstance(ids, (list, tuple, array)):
+            ids = list(ids)
+        if ids and (min(ids) < 0 or max(ids) >= self.vocab_size):
+            raise KeyError(self._invalid_id(ids))
+        return b"".join(map(self.tokens.__getitem__, ids))
+
+    def _invalid_id(self, ids):
+        return next(idx for idx in ids if not 0 <= idx < self.vocab_size)
+
+    def _gather(self, ids):
+        import numpy as np
+
+        if self._np_tables is None:
+            self._np_tables = (np.frombuffer(self.blob, dtype=np.uint8),
+                               np.frombuffer(self.offsets, dtype=np.uint32).astype(np.int64))
+        blob, offsets = self._np_tables
+        ids = np.asarray(ids, dtype=np.int64).ravel()
+        if ids.size and (ids.min() < 0 or ids.max() >= self.vocab_size):
+            raise KeyError(int(self._invalid_id(ids)))
+        starts = offsets[ids]
+        lengths = offsets[ids + 1] - starts
+        out = bytearray(int(lengths.sum()))
+        if out:
+            # Source position of every output byte: token start + offset within the token
+            shift = np.repeat(starts - (np.cumsum(lengths) - lengths), lengths)
+            np.take(blob, shift + np.arange(len(out)), out=np.frombuffer(out, dtype=np.uint8))
+        return out
+
+
+class StreamDecoder:
+    """
+    Incremental decoder for ids that arrive a few at a time (e.g. generation output).
+    A UTF-8 character split across tokens, or across calls, is held back until its
+    last byte arrives, so each call returns only complete text.
+    """
+
+    def __init__(self, table, errors="replace"):
+        self.table = table
+        self.utf8 = codecs.getincrementaldecoder("utf-8")(errors=errors)
+
+    def decode(self, ids, final=False):
+        """Text completed by `ids`; with final=True any incomplete tail is flushed."""
+        return self.utf8.decode(self.table.decode_bytes(ids), final)
+
+    def flush(self):
+        return self.utf8.decode(b"", True)
+
+    def reset(self):
+        self.utf8.reset()
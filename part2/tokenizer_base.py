@@ -0,0 +1,138 @@
+from array import array
+
+try:
+    from .tokenizer_io import save_tokenizer, load_tokenizer
+    from .token_table import TokenTable, StreamDecoder
+    from .batch import map_batch
+    from .offsets import check_unit, token_spans
+    from .id_buffers import write_ids, flat_batch
+    from .trie_encoder import TokenTrie
+    from .corpus import iter_lines, iter_file_lines
+except ImportError:
+    from tokenizer_io import save_tokenizer, load_tokenizer
+    from token_table import TokenTable, StreamDecoder
+    from batch import map_batch
+    from offsets import check_unit, token_spans
+    from id_buffers import write_ids, flat_batch
+    from trie_encoder import TokenTrie
+    from corpus import iter_lines, iter_file_lines
+
+# -----------------------------------------------------------------------------
+# Shared surface of the byte-level tokenizers
+# -----------------------------------------------------------------------------
+#
+# BPE_Tokenizer and SentencePieceBPE only differ in how they train and encode.
+# Everything built on top of merges / id_to_bytes / vocab_size / encode() lives
+# here: decoding tables, offsets, int32 buffers, batching, save/load and the
+# streaming train_* entry points.
+
+class TokenizerMixin:
+    # Built lazily by token_table() for decoding
+    _token_table = None
+    # Built lazily by token_trie() for encode_greedy()
+    _trie = None
+    # Bumped whenever the tables change, so batch worker pools get the new ones
+    _generation = 0
+
+    def _invalidate_tables(self):
+        """Drops everything derived from the merges; called whenever train/resume change them."""
+        self._token_table = None
+        self._trie = None
+        self._generation += 1
+
+    def train_from_iterator(self, lines, num_merges=50, **kwargs):
+        """
+        Trains on lines consumed lazily (generator, open file, ...), as if they were
+        joined with newlines. Only the counts train() aggregates are kept in memory.
+        Other keyword arguments are passed on to train().
+        """
+        self.train(iter_lines(lines), num_merges=num_merges, **kwargs)
+
+    def train_from_files(self, paths, num_merges=50, encoding="utf-8", errors="strict", **kwargs):
+        """
+        Trains on one or more text files, streamed line by line.
+        Other keyword arguments are passed on to train().
+        """
+        self.train(iter_file_lines(paths, encoding=encoding, errors=errors), num_merges=num_merges, **kwargs)
+
+    def _encode_array(self, text):
+        return array('i', self.encode(text))
+
+    def encode_into(self, text, buf, start=0):
+        """
+        Encodes text and copies the ids into buf[start:], a preallocated array('i')
+        or NumPy int32 array. Returns the number of ids written; raises ValueError
+        (writing nothing) if they do not fit.
+        """
+        return write_ids(self._encode_array(text), buf, start)
+
+    def encode_with_offsets(self, text, unit="byte"):
+        """
+        Encodes text like encode(), also reporting where every token came from.
+        Returns parallel arrays (ids array('i'), starts array('q'), ends array('q')):
+        token k covers bytes starts[k]:ends[k] of text.encode('utf-8') (unit="byte"),
+        or text[starts[k]:ends[k]] (unit="char").
+        """
+        check_unit(unit)
+        # encode() covers the whole text, so the tokens are consecutive byte ranges of it
+        ids = self._encode_array(text)
+        starts, ends = token_spans(ids, self.token_table().tokens, text, unit)
+        return ids, starts, ends
+
+    def decode(self, ids):
+        """
+        Converts a list of token IDs back into a string.
+        """
+        # 1. Concatenate the bytes for every token ID
+        # (ids may be a list, an array('i') or a NumPy array)
+        byte_sequence = self.token_table().decode_bytes(ids)
+
+        # 2. Decode the byte sequence into a UTF-8 string
+        return byte_sequence.decode('utf-8', errors='replace')
+
+    def token_table(self):
+        """Contiguous byte table of the current vocabulary, rebuilt after (re)training."""
+        table = self._token_table
+        if table is None or table.vocab_size != self.vocab_size:
+            table = self._token_table = TokenTable(self.id_to_bytes, self.vocab_size)
+        return table
+
+    def token_trie(self):
+        """Byte trie of the current vocabulary, rebuilt after (re)training."""
+        trie = self._trie
+        if trie is None or trie.vocab_size != self.vocab_size:
+            trie = self._trie = TokenTrie(self.token_table().tokens)
+        return trie
+
+    def stream_decoder(self):
+        """Incremental decoder: feed it ids as they are produced, get back complete text."""
+        return StreamDecoder(self.token_table())
+
+    def encode_batch(self, texts, num_workers=1, chunk_size=256):
+        """
+        Encodes a list of texts, optionally sharded over `num_workers` processes.
+        Results come back in input order.
+        """
+        return map_batch(self, "encode", texts, num_workers=num_workers, chunk_size=chunk_size)
+
+    def encode_batch_flat(self, texts, num_workers=1, chunk_size=256, as_numpy=False):
+        """
+        Encodes a list of texts into one flat buffer (ragged layout):
+        returns (ids, offsets) where the ids of texts[k] are ids[offsets[k]:offsets[k + 1]].
+        ids is an array('i') and offsets an array('q'), or NumPy int32/int64 views
+        of them with as_numpy=True.
+        """
+        return flat_batch(self, texts, num_workers=num_workers, chunk_size=chunk_size, as_numpy=as_numpy)
+
+    def decode_batch(self, batch, num_workers=1, chunk_size=256):
+        """Decodes a list of id lists (one per text), keeping input order."""
+        return map_batch(self, "decode", batch, num_workers=num_workers, chunk_size=chunk_size)
+
+    def save(self, path):
+        """Writes the merges and token bytes to a compact binary file (see tokenizer_io)."""
+        save_tokenizer(self, path)
+
+    @classmethod
+    def load(cls, path):
+        """Loads a tokenizer written by save() (see tokenizer_io)."""
+        return load_tokenizer(cls, path)
@@ -0,0 +1,145 @@
+import mmap
+import os
+import pickle
+import struct
+import sys
+from array import array
+
+# -----------------------------------------------------------------------------
+# Binary save/load for trained tokenizers
+# -----------------------------------------------------------------------------
+#
+# File layout (little-endian):
+#   header   HEADER struct: magic, format version, tokenizer kind,
+#            vocab_size, number of merges, token blob size in bytes
+#   merges   int32[num_merges * 3]: (id1, id2, new_id) in the order they were learned
+#   offsets  uint32[vocab_size + 1]: token i is blob[offsets[i]:offsets[i + 1]]
+#   blob     the bytes of every token, back to back
+#
+# Every section is a flat array at a 4-byte aligned offset, so load_tokenizer
+# reads it through mmap with no parsing step. The tables are then copied into
+# the tokenizer's own merges / id_to_bytes dictionaries and the file is closed,
+# so every process that loads it holds a private copy. The tables are not served
+# from the mapping because encoding looks up every adjacent pair in `merges`:
+# a dict lookup is far cheaper than a bisect over a mapped int array from Python.
+# A loaded tokenizer is an ordinary object and no longer depends on the file.
+
+MAGIC = b"BPETOK\x00\x01"
+VERSION = 1
+HEADER = struct.Struct("<8sIIIIQ")
+KINDS = {"BPE_Tokenizer": 0, "SentencePieceBPE": 1}
+
+
+class TokenizerFile:
+    """
+    Read-only, memory-mapped view of a saved tokenizer.
+    merges: int32 memoryview, 3 ints per merge; offsets: uint32 memoryview;
+    blob: bytes memoryview. Nothing is copied until a table is read.
+    """
+
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self.mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, kind, vocab_size, num_merges, blob_size = HEADER.unpack_from(self.mm, 0)
+        if magic != MAGIC:
+            raise ValueError(f"{path} is not a saved tokenizer")
+        if version != VERSION:
+            raise ValueError(f"{path}: unsupported tokenizer format version {version}")
+        self.kind = kind
+        self.vocab_size = vocab_size
+        self.num_merges = num_merges
+
+        view = memoryview(self.mm)
+        pos = HEADER.size
+        self.merges = self._int_view(view[pos:pos + 12 * num_merges], 'i')
+        pos += 12 * num_merges
+        self.offsets = self._int_view(view[pos:pos + 4 * (vocab_size + 1)], 'I')
+        pos += 4 * (vocab_size + 1)
+        self.blob = view[pos:pos + blob_size]
+
+    @staticmethod
+    def _int_view(raw, typecode):
+        if sys.byteorder == "little":
+            return raw.cast(typecode)
+        values = array(typecode, raw)  # big-endian host: swap into a private copy
+        values.byteswap()
+        return memoryview(values)
+
+    def token(self, idx):
+        return bytes(self.blob[self.offsets[idx]:self.offsets[idx + 1]])
+
+    def close(self):
+        for view in (self.merges, self.offsets, self.blob):
+            view.release()
+        self.mm.close()
+
+
+def save_tokenizer(tokenizer, path):
+    kind = KINDS[type(tokenizer).__name__]
+    merges = array('i')
+    for (a, b), new_id in tokenizer.merges.items():
+        merges.extend((a, b, new_id))
+
+    offsets = array('I', [0])
+    blob = bytearray()
+    for idx in range(tokenizer.vocab_size):
+        blob += tokenizer.id_to_bytes[idx]
+        offsets.append(len(blob))
+
+    if sys.byteorder != "little":
+        merges.byteswap()
+        offsets.byteswap()
+    with open(path, "wb") as f:
+        f.write(HEADER.pack(MAGIC, VERSION, kind, tokenizer.vocab_size, len(tokenizer.merges), len(blob)))
+        f.write(merges.tobytes())
+        f.write(offsets.tobytes())
+        f.write(blob)
+
+
+def load_tokenizer(cls, path):
+    """Rebuilds a `cls` tokenizer from a file written by save_tokenizer."""
+    table = TokenizerFile(path)
+    try:
+        if table.kind != KINDS[cls.__name__]:
+            raise ValueError(f"{path} does not hold a {cls.__name__}")
+        tokenizer = cls()
+        m = table.merges
+        tokenizer.merges = {(m[i], m[i + 1]): m[i + 2] for i in range(0, len(m), 3)}
+        tokenizer.id_to_bytes = {idx: table.token(idx) for idx in range(table.vocab_size)}
+        tokenizer.vocab_size = table.vocab_size
+        return tokenizer
+    finally:
+        table.close()
+
+
+# -----------------------------------------------------------------------------
+# Training checkpoints
+# -----------------------------------------------------------------------------
+#
+# A checkpoint is a pickled dict holding everything train() needs to carry on:
+# the merges and token bytes learned so far, the number of merge steps done and
+# the current (partially merged) word counts. It is written to a temporary file
+# and moved into place, so an interrupted write never clobbers the previous one.
+
+CHECKPOINT_VERSION = 1
+
+
+def check_checkpoint_every(checkpoint_every):
+    if checkpoint_every < 1:
+        raise ValueError(f"checkpoint_every must be at least 1, got {checkpoint_every}")
+
+
+def save_checkpoint(path, state):
+    state = dict(state, version=CHECKPOINT_VERSION)
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "wb") as f:
+        pickle.dump(state, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_path, path)
+
+
+def load_checkpoint(path):
+    with open(path, "rb") as f:
+        state = pickle.load(f)
+    if not isinstance(state, dict) or state.get("version") != CHECKPOINT_VERSION:
+        raise ValueError(f"{path} is not a training checkpoint")
+    return state
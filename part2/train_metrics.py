@@ -0,0 +1,72 @@
+from collections import namedtuple
+
+# -----------------------------------------------------------------------------
+# Training instrumentation
+# -----------------------------------------------------------------------------
+#
+# train(..., callback=obj) reports to `obj` as training goes:
+#   obj.on_start(num_sequences, count_s, index_s)   once, before the first merge
+#   obj.on_merge(stats)                             after every merge (a MergeStats)
+#   obj.on_end()                                    once, after the last merge
+# Subclass TrainingCallback and override only the hooks you need.
+
+# step:     merge number (1-based, as in the "Merge N:" log lines)
+# count:    frequency of the merged pair
+# touched:  number of sequences rewritten by the merge
+# select_s: time spent picking the best pair
+# merge_s:  time spent applying the merge and updating the pair counts around it
+# tokens:   tokens left in the training corpus after the merge
+# compression: corpus bytes per token after the merge
+MergeStats = namedtuple("MergeStats", "step pair new_id count touched select_s merge_s tokens compression")
+
+
+class TrainingCallback:
+    """No-op base class for training callbacks."""
+
+    def on_start(self, num_sequences, count_s, index_s):
+        """
+        num_sequences: unique words (BPE) or lines (SentencePiece) being merged
+        count_s: time spent reading and counting the corpus
+        index_s: time spent building the initial pair counts
+        """
+
+    def on_merge(self, stats):
+        pass
+
+    def on_end(self):
+        pass
+
+
+class TrainingMetrics(TrainingCallback):
+    """Keeps every MergeStats and summarizes where training time went."""
+
+    def __init__(self):
+        self.num_sequences = 0
+        self.count_s = 0.0
+        self.index_s = 0.0
+        self.merges = []
+
+    def on_start(self, num_sequences, count_s, index_s):
+        self.num_sequences = num_sequences
+        self.count_s = count_s
+        self.index_s = index_s
+
+    def on_merge(self, stats):
+        self.merges.append(stats)
+
+    def summary(self):
+        """Time per phase (seconds), merge and touched-sequence counts, and the final compression."""
+        select_s = sum(m.select_s for m in self.merges)
+        merge_s = sum(m.merge_s for m in self.merges)
+        return {
+            "sequences": self.num_sequences,
+            "merges": len(self.merges),
+            "count_s": self.count_s,
+            "index_s": self.index_s,
+            "select_s": select_s,
+            "merge_s": merge_s,
+            "total_s": self.count_s + self.index_s + select_s + merge_s,
+            "touched": sum(m.touched for m in self.merges),
+            "tokens": self.merges[-1].tokens if self.merges else None,
+            "compression": self.merges[-1].compression if self.merges else None,
+        }
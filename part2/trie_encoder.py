@@ -0,0 +1,109 @@
+import time
+from itertools import accumulate
+
+# -----------------------------------------------------------------------------
+# Greedy longest-match encoding over a byte trie
+# -----------------------------------------------------------------------------
+#
+# An approximate alternative to apply_merges(): walk the bytes left to right and
+# always take the longest vocabulary token that matches. One pass, no merge
+# ranks, but the segmentation can differ from the exact merge-order encoding:
+# if "bc" was learned before "ab", merging encodes "abc" as "a" + "bc" while the
+# greedy match gives "ab" + "c". greedy_divergence() measures how often it does.
+
+
+class TokenTrie:
+    """
+    Byte trie of a vocabulary. Node k has children[k] = { byte: child node } and
+    token[k] = id of the token spelled by the path to k (or None).
+    Empty tokens (the b"" padding entries of BPE_Tokenizer) are skipped, and when
+    two merges spell the same bytes the earlier learned id is kept.
+    tokens: id -> token bytes (TokenTable.tokens).
+    """
+
+    def __init__(self, tokens):
+        self.vocab_size = len(tokens)
+        self.children = [{}]
+        self.token = [None]
+        for idx, data in enumerate(tokens):
+            if not data:
+                continue
+            node = 0
+            for byte in data:
+                child = self.children[node].get(byte)
+                if child is None:
+                    child = len(self.children)
+                    self.children[node][byte] = child
+                    self.children.append({})
+                    self.token.append(None)
+                node = child
+            if self.token[node] is None:
+                self.token[node] = idx
+
+    def encode(self, data):
+        """Greedy longest-match token ids of the bytes `data`."""
+        children = self.children
+        token = self.token
+        ids = []
+        pos = 0
+        n = len(data)
+        while pos < n:
+            node = 0
+            best = None
+            end = i = pos
+            while i < n:
+                node = children[node].get(data[i])
+                if node is None:
+                    break
+                i += 1
+                if token[node] is not None:
+                    best = token[node]
+                    end = i
+            if best is None:
+                raise KeyError(f"byte {data[pos]} is not in the vocabulary")
+            ids.append(best)
+            pos = end
+        return ids
+
+
+def greedy_divergence(tokenizer, texts):
+    """
+    Encodes `texts` with both tokenizer.encode() and tokenizer.encode_greedy()
+    and reports how far apart they are:
+      texts / diverged_texts / divergence_rate: texts whose ids differ at all
+      exact_tokens / greedy_tokens:             total token counts
+      matching_tokens / token_agreement:        exact tokens that greedy also
+                                                produced, over the same bytes
+      exact_s / greedy_s:                       encoding times
+    """
+    texts = list(texts)
+    start = time.perf_counter()
+    exact = [tokenizer.encode(text) for text in texts]
+    exact_s = time.perf_counter() - start
+    start = time.perf_counter()
+    greedy = [tokenizer.encode_greedy(text) for text in texts]
+    greedy_s = time.perf_counter() - start
+
+    diverged = 0
+    matching = 0
+    token_len = [len(t) for t in tokenizer.token_table().tokens]
+    for a, b in zip(exact, greedy):
+        if a == b:
+            matching += len(a)
+            continue
+        diverged += 1
+        # A token matches if the same id covers the same byte span in both encodings
+        spans = set(zip(accumulate(map(token_len.__getitem__, a)), a))
+        matching += sum(1 for span in zip(accumulate(map(token_len.__getitem__, b)), b) if span in spans)
+    exact_tokens = sum(map(len, exact))
+    return {
+        "texts": len(texts),
+        "diverged_texts": diverged,
+        "divergence_rate": diverged / len(texts) if texts else 0.0,
+        "exact_tokens": exact_tokens,
+        "greedy_tokens": sum(map(len, greedy)),
+        "matching_tokens": matching,
+        "token_agreement": matching / exact_tokens if exact_tokens else 1.0,
+        "exact_s": exact_s,
+        "greedy_s": greedy_s,
+    }